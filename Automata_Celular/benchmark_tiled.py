@@ -0,0 +1,53 @@
+"""Throughput of TiledLattice for an increasing number of worker processes.
+
+Usage: python benchmark_tiled.py [width] [height] [generations]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from game_of_life.rules import step_lattice
+from game_of_life.tiled import TiledLattice
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    generations = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    rng = np.random.default_rng(42)
+    states = (rng.random((height, width)) < 0.2).astype(np.uint8)
+
+    # Single-process reference, also used to check the tiled results
+    start = time.perf_counter()
+    expected = states
+    for _ in range(generations):
+        expected = step_lattice(expected)
+    baseline = time.perf_counter() - start
+    cells = width * height * generations
+    print(f"{'workers':>7} {'seconds':>8} {'Mcells/s':>9} {'speedup':>7}")
+    print(f"{'ref':>7} {baseline:8.2f} {cells / baseline / 1e6:9.1f} {1:7.2f}")
+
+    workers = 1
+    while workers <= os.cpu_count():
+        lattice = TiledLattice(states, workers)
+        lattice.run(generations)  # Warm up the workers
+        start = time.perf_counter()
+        lattice.run(generations)
+        elapsed = time.perf_counter() - start
+
+        # 2 * generations in total, compare against the reference run twice
+        check = expected
+        for _ in range(generations):
+            check = step_lattice(check)
+        assert np.array_equal(lattice.states(), check), "tiled result differs"
+        lattice.close()
+
+        print(f"{workers:>7} {elapsed:8.2f} {cells / elapsed / 1e6:9.1f} {baseline / elapsed:7.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
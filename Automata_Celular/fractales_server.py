@@ -1,3 +1,4 @@
+import solara
 from game_of_life.model import ConwaysGameOfLife
 from mesa.visualization import (
     SolaraViz, # Varias pestañas con diferentes visualizaciones
@@ -19,6 +20,7 @@ def post_process(ax):
     ax.set_yticks([])
 
 model_params = {
+    "scheme": "row_sweep",
     "seed": {
         "type": "InputText",
         "value": 42,
@@ -50,18 +52,20 @@ model_params = {
     },
 }
 
-# Create initial model instance
-gof_model = ConwaysGameOfLife()
-
 space_component = make_space_component(
         agent_portrayal,
         draw_grid = False,
         post_process=post_process
 )
 
-page = SolaraViz( # controla modelo y visualizaciones
-    gof_model,
-    components=[space_component],
-    model_params=model_params,
-    name="Game of Life",
-)
+# The initial model instance is created on the first render of the page,
+# not when the module is imported
+@solara.component
+def Page():
+    gof_model = solara.use_memo(lambda: ConwaysGameOfLife(scheme="row_sweep"), dependencies=[])
+    SolaraViz( # controla modelo y visualizaciones
+        gof_model,
+        components=[space_component],
+        model_params=model_params,
+        name="Game of Life",
+    )
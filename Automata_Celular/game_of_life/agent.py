@@ -0,0 +1,61 @@
+# FixedAgent: Immobile agents permanently fixed to cells
+from mesa.discrete_space import FixedAgent
+
+class Cell(FixedAgent):
+    """Represents a single ALIVE or DEAD cell in the simulation."""
+
+    DEAD = 0
+    ALIVE = 1
+
+    @property
+    def is_alive(self):
+        return self.state == self.ALIVE
+
+    @property
+    def neighbors(self):
+        return self.cell.neighborhood.agents
+
+    def __init__(self, model, cell, init_state=DEAD): # Constructor
+        """Create a cell, in the given state, at the given x, y position."""
+        super().__init__(model) # super = Constructor de la clase padre
+        self.cell = cell
+        self.pos = cell.coordinate
+        self.x, self.y = cell.coordinate  # Cached as ints, read by every rule evaluation
+        self.state = init_state
+        self._next_state = None
+
+    def top_neighbors(self):
+        """The 3 cells above this one (left, center, right), with wrap-around."""
+        width, height = self.model.grid.dimensions
+        target_y = (self.y + 1) % height
+        return [
+            self.model.grid._cells[((self.x + dx) % width, target_y)].agents[0]
+            for dx in [-1, 0, 1]
+        ]
+
+    def determine_state(self):
+        """Compute if the cell will be dead or alive at the next tick based on
+        the 3 neighbors above it.  The state is not changed here, but is just
+        computed and stored in self._next_state, because our current state may
+        still be necessary for our neighbors to calculate their next state.
+        """
+        left, center, right = (neighbor.state for neighbor in self.top_neighbors())
+
+        # Apply the model's elementary rule (rule 90 by default):
+        # 111 -> 0, 110 -> 1, 101 -> 0, 100 -> 1, 011 -> 1, 010 -> 0, 001 -> 1, 000 -> 0
+        self._next_state = int(self.model.table[left * 4 + center * 2 + right])
+
+    def dependents(self):
+        """The 3 cells below this one (with wrap-around), whose next state is computed from it."""
+        width, height = self.model.grid.dimensions
+        target_y = (self.y - 1) % height
+        return [
+            self.model.grid._cells[((self.x + dx) % width, target_y)].agents[0]
+            for dx in [-1, 0, 1]
+        ]
+
+    def assume_state(self):
+        """Set the state to the new computed state."""
+        if self._next_state is not None:
+            self.state = self._next_state
+
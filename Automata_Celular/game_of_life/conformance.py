@@ -0,0 +1,135 @@
+"""Conformance checks of every stepping engine against the agents engine.
+
+Every engine and update scheme must reproduce, generation by generation, the
+lattices of the Mesa agents engine, which is the reference implementation.
+Run from Automata_Celular with:
+
+    python -m game_of_life.conformance
+"""
+import warnings
+from functools import lru_cache
+
+import numpy as np
+
+from .engines import ENGINES
+from .ensemble import GameOfLifeEnsemble
+from .model import SCHEMES, ConwaysGameOfLife
+
+SIZES = [(5, 3), (8, 8), (13, 7), (50, 50)]
+SEEDS = [1, 42]
+FRACTIONS = [0.1, 0.5]
+RULES = [90, 30, 110]
+
+
+def cases(rules=RULES):
+    """Every (width, height, seed, fraction, rule) combination to check."""
+    for width, height in SIZES:
+        for seed in SEEDS:
+            for fraction in FRACTIONS:
+                for rule in rules:
+                    yield width, height, seed, fraction, rule
+
+
+def run(scheme, width, height, seed, fraction, rule, **kwargs):
+    """Lattices of every step of a model, until it stops (at most height + 2 steps)."""
+    model = ConwaysGameOfLife(
+        width=width, height=height, initial_fraction_alive=fraction, seed=seed,
+        scheme=scheme, rule=rule, **kwargs
+    )
+    lattices = [model.lattice()]
+    for _ in range(height + 2):
+        if not model.running:
+            break
+        model.step()
+        lattices.append(model.lattice())
+    model.close()
+    return lattices
+
+
+@lru_cache(maxsize=None)
+def reference(scheme, width, height, seed, fraction, rule):
+    """Lattices of the agents engine, shared by every engine checked."""
+    return run(scheme, width, height, seed, fraction, rule)
+
+
+def check_engine(engine, scheme, **kwargs):
+    """Compare an engine with the agents engine on every case.
+
+    Raises AssertionError on the first lattice that differs.
+    Returns: Number of cases checked
+    """
+    # Odd rules turn a dead trio alive, which the active row sweep skips
+    rules = [rule for rule in RULES if not (scheme == "row_sweep" and kwargs.get("active_region") and rule & 1)]
+    checked = 0
+    for width, height, seed, fraction, rule in cases(rules):
+        expected = reference(scheme, width, height, seed, fraction, rule)
+        actual = run(scheme, width, height, seed, fraction, rule, engine=engine, **kwargs)
+        assert len(actual) == len(expected), f"{engine}/{scheme}: different number of steps"
+        for generation, (a, b) in enumerate(zip(actual, expected)):
+            assert np.array_equal(a, b), (
+                f"{engine}/{scheme} differs at generation {generation} "
+                f"(width={width}, height={height}, seed={seed}, fraction={fraction}, rule={rule})"
+            )
+        checked += 1
+    return checked
+
+
+def check_ensemble():
+    """Compare the GameOfLifeEnsemble members with synchronous agents models."""
+    members = [(seed, fraction) for seed in SEEDS for fraction in FRACTIONS]
+    checked = 0
+    for width, height in SIZES:
+        for rule in RULES:
+            ensemble = GameOfLifeEnsemble(
+                [seed for seed, _ in members], [fraction for _, fraction in members], width, height, rule
+            )
+            expected = [reference("synchronous", width, height, seed, fraction, rule) for seed, fraction in members]
+            for generation in range(len(expected[0])):
+                for i, lattices in enumerate(expected):
+                    assert np.array_equal(ensemble.member(i), lattices[generation]), (
+                        f"ensemble member {i} differs at generation {generation} "
+                        f"(width={width}, height={height}, rule={rule})"
+                    )
+                ensemble.step()
+            checked += len(members)
+    return checked
+
+
+def check_defaults():
+    """Check that models built with the default arguments (like the servers do)
+    do no more work per step than the engine step, like the original Ruido and
+    Fractales models: no lattice copies for diagrams, cycle hashes or history.
+
+    Raises AssertionError otherwise.
+    """
+    for scheme in SCHEMES:
+        model = ConwaysGameOfLife(width=8, height=8, seed=1, scheme=scheme)
+        copies = []
+        lattice = model.engine.lattice
+        model.engine.lattice = lambda: copies.append(model.steps) or lattice()
+        for _ in range(10):
+            model.step()
+        assert not copies, f"a default {scheme} model copies the lattice at steps {copies}"
+        assert not model.seen_states, f"a default {scheme} model hashes its lattices"
+
+
+def main():
+    warnings.filterwarnings("ignore", message="Random number generator not specified")
+    check_defaults()
+    print(f"{'defaults':>11} {'no work beyond the engine':<24} ok")
+    for scheme in SCHEMES:
+        variants = [(engine, {}) for engine in ENGINES if engine != "agents"]
+        variants.append(("agents", {"active_region": True}))
+        for engine, kwargs in variants:
+            if engine == "tiled":
+                if scheme != "synchronous":
+                    continue
+                kwargs = {"workers": 2}
+            checked = check_engine(engine, scheme, **kwargs)
+            label = engine + (" (active region)" if kwargs.get("active_region") else "")
+            print(f"{scheme:>11} {label:<24} ok ({checked} cases)")
+    print(f"{'synchronous':>11} {'ensemble':<24} ok ({check_ensemble()} cases)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import struct
+import time
+import weakref
+
+import numpy as np
+
+# Fixed header size, so the row count can be rewritten in place
+HEADER_SIZE = 128
+
+
+def _header(rows, row_bytes):
+    """Npy 1.0 header of a (rows, row_bytes) uint8 array, padded to HEADER_SIZE bytes."""
+    header = "{'descr': '|u1', 'fortran_order': False, 'shape': (%d, %d), }" % (rows, row_bytes)
+    header = header.ljust(HEADER_SIZE - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _finish(file, row_bytes):
+    """Write the row count (from the size of the file) to the header and close it."""
+    if file.closed:
+        return
+    rows = (file.seek(0, 2) - HEADER_SIZE) // row_bytes
+    file.seek(0)
+    file.write(_header(rows, row_bytes))
+    file.close()
+
+
+class SpaceTimeWriter:
+    """Streams the rows of a space-time diagram to a .npy file as packed bits.
+
+    Rows are packed with np.packbits and appended to the file as soon as they
+    are produced, so memory stays constant no matter how long the run is.
+    The file is a regular (rows, ceil(width / 8)) uint8 .npy array that can be
+    memory-mapped with read_diagram while or after it is written: the row
+    count in the header is updated every flush_every rows or flush_seconds,
+    whichever comes first, and when the writer is closed or garbage collected.
+    """
+
+    def __init__(self, path, width, flush_every=4096, flush_seconds=1.0):
+        """Create (or overwrite) the diagram file.
+
+        Args:
+            path: Destination .npy file
+            width: Number of cells in every row
+            flush_every: Rows between updates of the row count in the header
+            flush_seconds: Seconds between updates of the row count in the header
+        """
+        self.path = path
+        self.width = width
+        self.row_bytes = (width + 7) // 8
+        self.rows = 0
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._unflushed = 0
+        self._flushed_at = float("-inf")  # The first rows are readable right away
+        self._file = open(path, "wb")
+        self._file.write(_header(0, self.row_bytes))
+        # A diagram dropped without close() is still a complete file
+        self._finalizer = weakref.finalize(self, _finish, self._file, self.row_bytes)
+
+    def append(self, rows):
+        """Append one row (width,) or a block of rows (n, width) of 0/1 states."""
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.uint8))
+        if rows.shape[1] != self.width:
+            raise ValueError(f"Expected rows of width {self.width}, got {rows.shape[1]}")
+        self._file.write(np.packbits(rows, axis=1).tobytes())
+        self.rows += len(rows)
+
+        self._unflushed += len(rows)
+        if (self._unflushed >= self.flush_every
+                or time.monotonic() - self._flushed_at >= self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        """Write the current row count to the header and flush the file."""
+        self._file.seek(0)
+        self._file.write(_header(self.rows, self.row_bytes))
+        self._file.seek(0, 2)
+        self._file.flush()
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        """Flush and close the file."""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_diagram(path, width, start=0, stop=None):
+    """Read rows [start, stop) of a diagram written by SpaceTimeWriter.
+
+    The file is memory-mapped, so only the requested rows are loaded.
+    Returns: (rows, width) uint8 array of 0/1 states
+    """
+    packed = np.load(path, mmap_mode="r")
+    return np.unpackbits(packed[start:stop], axis=1, count=width)
@@ -0,0 +1,212 @@
+import numpy as np
+from mesa.discrete_space import OrthogonalMooreGrid
+
+from .agent import Cell
+from .rules import next_rows, step_rows
+from .tiled import TiledLattice
+
+
+class AgentEngine:
+    """Reference engine: one Mesa Cell agent per cell, placed on model.grid.
+
+    Every other engine must give the same lattices as this one (see conformance).
+    """
+
+    def __init__(self, model, states):
+        height, width = states.shape
+        self.model = model
+
+        """Grid where cells are connected to their 8 neighbors.
+
+        Example for two dimensions:
+        directions = [
+            (-1, -1), (-1, 0), (-1, 1),
+            ( 0, -1),          ( 0, 1),
+            ( 1, -1), ( 1, 0), ( 1, 1),
+        ]
+        """
+        model.grid = OrthogonalMooreGrid((width, height), capacity=1, torus=True) # torus = True means the grid wraps around at edges
+
+        # Cells of each row, in x order
+        self.rows = {y: [] for y in range(height)}
+        for cell in model.grid.all_cells:
+            x, y = cell.coordinate
+            self.rows[y].append(Cell(model, cell, init_state=int(states[y, x])))
+
+        # Cells to evaluate in the next step (None means every cell)
+        self.active = None
+
+    def step(self):
+        """Synchronous generation: all cells determine, then assume, their next state."""
+        if self.model.active_region:
+            self.step_active()
+        else:
+            self.model.agents.do("determine_state")
+            self.model.agents.do("assume_state")
+
+    def step_active(self):
+        """Evaluate only the cells whose 3 top neighbors changed last generation.
+
+        Every state is the rule applied to the previous inputs, so a cell whose
+        inputs did not change keeps its state. The first step evaluates all cells.
+        """
+        cells = list(self.model.agents) if self.active is None else list(self.active)
+        for agent in cells:
+            agent.determine_state()
+        changed = [agent for agent in cells if agent._next_state != agent.state]
+        for agent in cells:
+            agent.assume_state()
+
+        self.active = {dependent for agent in changed for dependent in agent.dependents()}
+
+    def step_row(self, y):
+        """Compute row y from the row above it."""
+        if self.model.active_region and self.active is not None:
+            agents_in_row = list(self.active)
+        else:
+            agents_in_row = self.rows[y]
+
+        for agent in agents_in_row:
+            agent.determine_state()
+        for agent in agents_in_row:
+            agent.assume_state()
+
+        if self.model.active_region:
+            # Rows below start dead and a dead trio stays dead (even rules),
+            # so only cells under alive cells can change
+            self.active = {
+                dependent
+                for agent in agents_in_row if agent.is_alive
+                for dependent in agent.dependents()
+            }
+
+    def row(self, y):
+        return np.array([agent.state for agent in self.rows[y]], dtype=np.uint8)
+
+    def lattice(self):
+        return np.stack([self.row(y) for y in range(len(self.rows))])
+
+    def load(self, states):
+        """Set every cell to the given (height, width) states."""
+        for y, agents in self.rows.items():
+            for x, agent in enumerate(agents):
+                agent.state = int(states[y, x])
+                agent._next_state = None
+        self.active = None
+
+    def close(self):
+        """Nothing to release: the cells are agents of the model."""
+
+
+class NumpyEngine:
+    """One uint8 per cell in a (height, width) array, stepped with table lookups."""
+
+    def __init__(self, model, states):
+        self.table = model.table
+        self.states = states.copy()
+
+    def step(self):
+        following = np.empty_like(self.states)
+        step_rows(self.states, following, 0, len(self.states), self.table)
+        self.states = following
+
+    def step_row(self, y):
+        self.states[y] = next_rows(self.states[(y + 1) % len(self.states)], self.table)
+
+    def row(self, y):
+        return self.states[y].copy()
+
+    def lattice(self):
+        return self.states.copy()
+
+    def load(self, states):
+        self.states = states.copy()
+
+    def close(self):
+        pass
+
+
+class BitPackedEngine:
+    """One bit per cell: every row is a Python int where bit x is cell x.
+
+    The rule is applied to whole rows with bitwise operations, as the OR of
+    one AND term per 3-cell pattern that leads to ALIVE.
+    """
+
+    def __init__(self, model, states):
+        self.height, self.width = states.shape
+        self.mask = (1 << self.width) - 1
+        self.patterns = [pattern for pattern in range(8) if model.table[pattern]]
+        self.rows = [self.pack(row) for row in states]
+
+    def pack(self, row):
+        return int.from_bytes(np.packbits(row, bitorder="little").tobytes(), "little")
+
+    def unpack(self, bits):
+        data = np.frombuffer(bits.to_bytes((self.width + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(data, count=self.width, bitorder="little")
+
+    def next_row(self, above):
+        """Row below `above`, wrapping around horizontally."""
+        width, mask = self.width, self.mask
+        left = ((above << 1) | (above >> (width - 1))) & mask  # bit x = cell x - 1
+        right = (above >> 1) | ((above & 1) << (width - 1))  # bit x = cell x + 1
+        row = 0
+        for pattern in self.patterns:
+            term = left if pattern & 4 else ~left
+            term &= above if pattern & 2 else ~above
+            term &= right if pattern & 1 else ~right
+            row |= term
+        return row & mask
+
+    def step(self):
+        self.rows = [self.next_row(self.rows[(y + 1) % self.height]) for y in range(self.height)]
+
+    def step_row(self, y):
+        self.rows[y] = self.next_row(self.rows[(y + 1) % self.height])
+
+    def row(self, y):
+        return self.unpack(self.rows[y])
+
+    def lattice(self):
+        return np.stack([self.unpack(bits) for bits in self.rows])
+
+    def load(self, states):
+        self.rows = [self.pack(row) for row in states]
+
+    def close(self):
+        pass
+
+
+class TiledEngine:
+    """Strips of rows stepped by worker processes in shared memory (synchronous only)."""
+
+    def __init__(self, model, states):
+        self.tiled = TiledLattice(states, model.workers, model.rule)
+
+    def step(self):
+        self.tiled.run(1)
+
+    def step_row(self, y):
+        raise ValueError("The tiled engine only supports the synchronous scheme")
+
+    def row(self, y):
+        return self.lattice()[y]
+
+    def lattice(self):
+        return self.tiled.states()
+
+    def load(self, states):
+        self.tiled.load(states)
+
+    def close(self):
+        """Stop the worker processes and free the shared memory."""
+        self.tiled.close()
+
+
+ENGINES = {
+    "agents": AgentEngine,
+    "numpy": NumpyEngine,
+    "bitpacked": BitPackedEngine,
+    "tiled": TiledEngine,
+}
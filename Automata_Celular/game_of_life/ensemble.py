@@ -0,0 +1,100 @@
+import random
+
+import numpy as np
+
+from .model import initial_lattice
+from .rules import rule_table
+
+
+class GameOfLifeEnsemble:
+    """Many independent lattices of ConwaysGameOfLife stepped together.
+
+    The B members are stored as one (B, height, width) array, so a single
+    vectorized step advances all of them at once. Member i starts exactly like
+    ConwaysGameOfLife(width, height, fractions[i], seeds[i]) with the
+    synchronous scheme.
+    """
+
+    def __init__(self, seeds, initial_fraction_alive=0.2, width=50, height=50, rule=90):
+        """Create one lattice per seed.
+
+        Args:
+            seeds: Random seed of each member
+            initial_fraction_alive: One fraction for all members or one per member
+            width, height: Size of every lattice
+            rule: Elementary rule applied to the 3 cells above each cell
+        """
+        seeds = list(seeds)
+        if np.isscalar(initial_fraction_alive):
+            fractions = [initial_fraction_alive] * len(seeds)
+        else:
+            fractions = list(initial_fraction_alive)
+        if len(fractions) != len(seeds):
+            raise ValueError("initial_fraction_alive needs one value per seed")
+
+        self.width = width
+        self.height = height
+        self.seeds = seeds
+        self.fractions = fractions
+        self.table = rule_table(rule)
+        self.steps = 0
+
+        self.states = np.zeros((len(seeds), height, width), dtype=np.uint8)
+        for i, (seed, fraction) in enumerate(zip(seeds, fractions)):
+            self.states[i] = self.initial_state(seed, fraction)
+
+        self._density = []
+        self._entropy = []
+        self.record()
+
+    def initial_state(self, seed, fraction):
+        """Draw a lattice with the same random sequence as ConwaysGameOfLife."""
+        return initial_lattice(random.Random(seed), self.width, self.height, fraction)
+
+    def neighborhoods(self):
+        """Pattern index (left*4 + center*2 + right) of the 3 cells above every cell."""
+        above = np.roll(self.states, -1, axis=1)
+        left = np.roll(above, 1, axis=2)
+        right = np.roll(above, -1, axis=2)
+        return (left << 2) | (above << 1) | right
+
+    def step(self):
+        """Advance every member by one generation."""
+        # record() already computed the patterns of the current generation
+        self.states = self.table[self._patterns]
+        self.steps += 1
+        self.record()
+
+    def run(self, generations):
+        """Advance every member by the given number of generations."""
+        for _ in range(generations):
+            self.step()
+
+    def record(self):
+        """Store the statistics of the current generation."""
+        cells = self.width * self.height
+        self._density.append(self.states.sum(axis=(1, 2)) / cells)
+
+        # Shannon entropy of the 8 neighborhood patterns of each member, in bits
+        members = len(self.seeds)
+        self._patterns = self.neighborhoods()
+        patterns = self._patterns.reshape(members, -1)
+        offsets = np.arange(members)[:, None] * 8
+        counts = np.bincount((patterns + offsets).ravel(), minlength=members * 8)
+        p = counts.reshape(members, 8) / cells
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._entropy.append(-np.nansum(p * np.log2(p), axis=1))
+
+    @property
+    def density(self):
+        """Fraction of alive cells, shape (generations + 1, B)."""
+        return np.stack(self._density)
+
+    @property
+    def entropy(self):
+        """Neighborhood pattern entropy in bits, shape (generations + 1, B)."""
+        return np.stack(self._entropy)
+
+    def member(self, i):
+        """Current (height, width) lattice of member i."""
+        return self.states[i]
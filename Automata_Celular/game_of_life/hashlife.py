@@ -0,0 +1,151 @@
+from collections import OrderedDict
+
+
+class Node:
+    """Block of 2**level cells. Leaves (level 0) hold a single state."""
+
+    __slots__ = ("level", "left", "right", "state")
+
+    def __init__(self, level, left=None, right=None, state=0):
+        self.level = level
+        self.left = left
+        self.right = right
+        self.state = state
+
+
+class HashLife:
+    """Hashlife engine for the 1D rules used by ConwaysGameOfLife.
+
+    Blocks are hash-consed binary trees, so identical row segments are the
+    same Node object. The result of advancing a block of 2**k cells by 2**j
+    generations (j <= k - 2) is its center 2**(k - 1) cells, and it is
+    memoized per (node, j). With radius 1, 2**(k - 2) is the largest jump
+    a 2**k block can make while keeping a center half of valid cells.
+    """
+
+    def __init__(self, rule=90, max_nodes=1 << 20, max_results=1 << 20):
+        """Create an engine for an elementary rule.
+
+        Args:
+            rule: Rule number; pattern left*4 + center*2 + right maps to bit pattern
+            max_nodes: Size above which the hash-consing table is cleared
+            max_results: Number of memoized results kept (least recently used are evicted)
+        """
+        self.rule = rule
+        self.max_nodes = max_nodes
+        self.max_results = max_results
+        self.leaves = (Node(0, state=0), Node(0, state=1))
+        self._nodes = {}
+        self._results = OrderedDict()
+
+    def cell(self, left, center, right):
+        """Next state of a cell given the 3 cells above it."""
+        return (self.rule >> (left * 4 + center * 2 + right)) & 1
+
+    def join(self, left, right):
+        """Canonical node made of two halves of the same level."""
+        key = (left, right)
+        node = self._nodes.get(key)
+        if node is None:
+            # Clearing only costs sharing, old nodes stay valid
+            if len(self._nodes) >= self.max_nodes:
+                self._nodes.clear()
+            node = Node(left.level + 1, left, right)
+            self._nodes[key] = node
+        return node
+
+    def center(self, node):
+        """Center half of a node, without advancing time."""
+        return self.join(node.left.right, node.right.left)
+
+    def successor(self, node, j):
+        """Center 2**(level - 1) cells of node after 2**j generations."""
+        key = (node, j)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+
+        if node.level == 2:
+            # 4 cells a b c d -> b c after one generation
+            a, b = node.left.left.state, node.left.right.state
+            c, d = node.right.left.state, node.right.right.state
+            result = self.join(self.leaves[self.cell(a, b, c)], self.leaves[self.cell(b, c, d)])
+        else:
+            n0 = node.left
+            n1 = self.join(node.left.right, node.right.left)
+            n2 = node.right
+            if j == node.level - 2:
+                # Full speed: two half jumps of 2**(j - 1) generations
+                r0 = self.successor(n0, j - 1)
+                r1 = self.successor(n1, j - 1)
+                r2 = self.successor(n2, j - 1)
+                half = j - 1
+            else:
+                r0, r1, r2 = self.center(n0), self.center(n1), self.center(n2)
+                half = j
+            result = self.join(
+                self.successor(self.join(r0, r1), half),
+                self.successor(self.join(r1, r2), half),
+            )
+
+        self._results[key] = result
+        if len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return result
+
+    def build(self, cells, level, start):
+        """Node of 2**level cells read from the ring `cells` starting at `start`."""
+        width = len(cells)
+        built = {}
+
+        def node(level, start):
+            if level == 0:
+                return self.leaves[cells[start]]
+            key = (level, start)
+            if key not in built:
+                half = 1 << (level - 1)
+                built[key] = self.join(node(level - 1, start), node(level - 1, (start + half) % width))
+            return built[key]
+
+        return node(level, start % width)
+
+    def cells(self, node, count):
+        """First `count` cell states of a node, left to right."""
+        states = []
+        stack = [node]
+        while stack and len(states) < count:
+            current = stack.pop()
+            if current.level == 0:
+                states.append(current.state)
+            else:
+                stack.append(current.right)
+                stack.append(current.left)
+        return states
+
+    def advance(self, cells, generations):
+        """Advance a ring of cells (wrapping at both ends) by any number of generations.
+
+        Args:
+            cells: Sequence of 0/1 states
+            generations: Number of generations to advance
+        Returns:
+            List with the states after the given generations
+        """
+        cells = [int(state) for state in cells]
+        j = 0
+        while generations:
+            if generations & 1:
+                cells = self._advance_ring(cells, j)
+            generations >>= 1
+            j += 1
+        return cells
+
+    def _advance_ring(self, cells, j):
+        """Advance a ring of cells by 2**j generations."""
+        width = len(cells)
+        # The result (center half) must hold the whole ring
+        level = max(j + 2, (width - 1).bit_length() + 1, 2)
+        quarter = 1 << (level - 2)
+        root = self.build(cells, level, -quarter)
+        return self.cells(self.successor(root, j), width)
@@ -0,0 +1,151 @@
+import zlib
+
+import numpy as np
+
+
+class GenerationHistory:
+    """Bounded store of the recent generations of a lattice, compressed in memory.
+
+    Every generation is XOR-ed with the previous one, moved down shift rows
+    (in the synchronous scheme every row is computed from the row above it),
+    and bit-packed (np.packbits), so the cells that did not change become zero
+    bytes, which zlib compresses to almost nothing. Every keyframe_interval
+    generations the packed lattice is stored whole, so any generation is
+    rebuilt from at most keyframe_interval - 1 deltas, whatever the length of
+    the history.
+
+    Chaotic rules change about half of the cells every generation, and their
+    deltas don't compress. With a step function, deltas larger than
+    recompute_ratio of the packed lattice are not stored: that generation is
+    computed again from the previous one when it is read.
+
+    When the stored bytes go over max_bytes, the oldest keyframe is dropped
+    with its deltas.
+    """
+
+    def __init__(self, shape, max_bytes=256 << 20, keyframe_interval=16, shift=0, step=None,
+                 recompute_ratio=0.25, level=1):
+        """Create an empty history.
+
+        Args:
+            shape: (height, width) of the lattices
+            max_bytes: Memory budget of the compressed frames
+            keyframe_interval: Generations between keyframes
+            shift: Rows the lattice moves down each generation, compared to
+                the previous one to compute the deltas
+            step: Function that computes the next lattice from a lattice, or
+                None to store every delta
+            recompute_ratio: Largest delta (as a fraction of the packed lattice)
+                kept when there is a step function
+            level: zlib compression level
+        """
+        self.shape = shape
+        self.max_bytes = max_bytes
+        self.keyframe_interval = keyframe_interval
+        self.shift = shift
+        self.step = step
+        self.recompute_ratio = recompute_ratio
+        self.level = level
+
+        # Generation of each keyframe -> its frames: the compressed keyframe,
+        # then one compressed delta (or None, to recompute) per generation
+        self.groups = {}
+        self.first = None  # Oldest generation kept
+        self.last = None  # Newest generation
+        self.nbytes = 0
+        self._previous = None  # Lattice of the last generation
+        self._cache = None  # (generation, lattice) of the last one read
+
+    def __len__(self):
+        return 0 if self.last is None else self.last - self.first + 1
+
+    def __contains__(self, generation):
+        return self.last is not None and self.first <= generation <= self.last
+
+    def append(self, generation, states):
+        """Store the (height, width) lattice of the generation after the last one."""
+        if self.last is not None and generation != self.last + 1:
+            raise ValueError(f"Expected generation {self.last + 1}, got {generation}")
+        states = np.asarray(states, dtype=np.uint8)
+
+        if self.last is None or generation % self.keyframe_interval == 0:
+            packed = np.packbits(states)
+            frame = zlib.compress(packed.tobytes(), self.level)
+            self.groups[generation] = [frame]
+            if self.first is None:
+                self.first = generation
+        else:
+            packed = np.packbits(states ^ self._reference(self._previous))
+            frame = zlib.compress(packed.tobytes(), self.level)
+            if self.step is not None and len(frame) > self.recompute_ratio * packed.nbytes:
+                frame = None
+            self.groups[self._keyframe(generation)].append(frame)
+
+        self.nbytes += len(frame) if frame is not None else 0
+        self.last = generation
+        self._previous = states.copy()
+        self.evict()
+
+    def evict(self):
+        """Drop the oldest keyframes (with their deltas) until the frames fit in max_bytes."""
+        while self.nbytes > self.max_bytes and len(self.groups) > 1:
+            start = next(iter(self.groups))
+            frames = self.groups.pop(start)
+            self.nbytes -= sum(len(frame) for frame in frames if frame is not None)
+            self.first = next(iter(self.groups))
+        if self._cache is not None and self._cache[0] < self.first:
+            self._cache = None
+
+    def truncate(self, generation):
+        """Forget the generations after the given one (after a rewind)."""
+        if generation not in self:
+            raise KeyError(f"Generation {generation} is not in the history")
+        self._previous = self[generation]
+        start = self._keyframe(generation)
+        for later in [key for key in self.groups if key > start]:
+            frames = self.groups.pop(later)
+            self.nbytes -= sum(len(frame) for frame in frames if frame is not None)
+        frames = self.groups[start]
+        for frame in frames[generation - start + 1:]:
+            self.nbytes -= len(frame) if frame is not None else 0
+        del frames[generation - start + 1:]
+        self.last = generation
+        if self._cache is not None and self._cache[0] > generation:
+            self._cache = None
+
+    def _keyframe(self, generation):
+        """Generation of the keyframe a generation is stored after."""
+        if generation < self.keyframe_interval * -(-self.first // self.keyframe_interval):
+            return self.first  # Before the first regular keyframe
+        return generation - generation % self.keyframe_interval
+
+    def _reference(self, states):
+        """Lattice the next generation is compared to: row y takes row y + shift."""
+        return np.roll(states, -self.shift, axis=0) if self.shift else states
+
+    def __getitem__(self, generation):
+        """(height, width) lattice of a generation still in the history."""
+        if generation not in self:
+            raise KeyError(f"Generation {generation} is not in the history ({self.first} to {self.last})")
+        start = self._keyframe(generation)
+        frames = self.groups[start]
+
+        # Go on from the last generation read if it is on the way
+        if self._cache is not None and start <= self._cache[0] <= generation:
+            current, states = self._cache
+        else:
+            current, states = start, self._unpack(frames[0])
+        while current < generation:
+            current += 1
+            frame = frames[current - start]
+            if frame is None:
+                states = self.step(states)
+            else:
+                states = self._reference(states) ^ self._unpack(frame)
+        self._cache = (generation, states)
+        return states.copy()
+
+    def _unpack(self, frame):
+        """(height, width) array of a compressed frame."""
+        packed = np.frombuffer(zlib.decompress(frame), dtype=np.uint8)
+        return np.unpackbits(packed, count=self.shape[0] * self.shape[1]).reshape(self.shape)
@@ -0,0 +1,49 @@
+import tracemalloc
+from collections import Counter
+
+
+def agent_memory(agents):
+    """Bytes still allocated by the constructors of each agent type, as traced by tracemalloc.
+
+    An allocation is charged to the outermost agent constructor in its
+    traceback, so it covers the agent and what Mesa allocates to register it.
+    Tracing has to start before the model is built, keeping enough frames to
+    reach the constructors (tracemalloc.start(25) is plenty).
+
+    Args:
+        agents: Agents of a model
+    Returns:
+        Agent type name -> {"agents", "bytes", "bytes_per_agent"}, plus
+        "total" with the bytes currently traced
+    """
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not tracing; call tracemalloc.start(25) before building the model")
+
+    counts = Counter(type(agent) for agent in agents)
+    # (file, line) of the constructor of every agent type
+    lines = {}
+    for kind in counts:
+        code = kind.__init__.__code__
+        for _, _, line in code.co_lines():
+            if line is not None:
+                lines.setdefault((code.co_filename, line), kind)
+
+    sizes = Counter()
+    for stat in tracemalloc.take_snapshot().statistics("traceback"):
+        # Frames go from the oldest to the most recent
+        for frame in stat.traceback:
+            kind = lines.get((frame.filename, frame.lineno))
+            if kind is not None:
+                sizes[kind] += stat.size
+                break
+
+    report = {
+        kind.__name__: {
+            "agents": count,
+            "bytes": sizes[kind],
+            "bytes_per_agent": sizes[kind] / count,
+        }
+        for kind, count in counts.items()
+    }
+    report["total"] = tracemalloc.get_traced_memory()[0]
+    return report
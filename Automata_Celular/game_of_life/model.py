@@ -0,0 +1,250 @@
+import hashlib
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+from mesa import Model
+from .agent import Cell
+from .diagram import SpaceTimeWriter
+from .engines import ENGINES
+from .hashlife import HashLife
+from .history import GenerationHistory
+from .memory import agent_memory
+from .rules import rule_table, step_lattice
+
+# synchronous: every cell is updated each step from the row above it, on a torus (Ruido)
+# row_sweep: starting from a random top row, one row is filled per step, downward (Fractales)
+SCHEMES = ("synchronous", "row_sweep")
+
+
+def initial_lattice(rng, width, height, initial_fraction_alive, scheme="synchronous"):
+    """Initial (height, width) states, drawn in the order the grid creates its cells
+    (column by column), so every engine starts from the same lattice.
+
+    The synchronous scheme draws every cell, the row sweep only the top row.
+    """
+    if scheme == "row_sweep":
+        states = np.zeros((height, width), dtype=np.uint8)
+        states[height - 1] = [
+            Cell.ALIVE if rng.random() < initial_fraction_alive else Cell.DEAD
+            for _ in range(width)
+        ]
+        return states
+
+    draws = np.array([rng.random() for _ in range(width * height)])
+    alive = draws.reshape(width, height).T < initial_fraction_alive
+    return np.where(alive, Cell.ALIVE, Cell.DEAD).astype(np.uint8)
+
+
+class ConwaysGameOfLife(Model):
+    """Represents the 2-dimensional array of cells in Conway's Game of Life."""
+
+    def __init__(self, width=50, height=50, initial_fraction_alive=0.2, seed=None, scheme="synchronous",
+                 engine="agents", rule=90, diagram_path=None, cycle_window=0, stop_on_cycle=False,
+                 active_region=False, workers=None, history_bytes=None,
+                 keyframe_interval=16):
+        """Create a new playing area of (width, height) cells.
+
+        Args:
+            scheme: Update scheme, "synchronous" or "row_sweep" (see SCHEMES)
+            engine: "agents" (Mesa Cell agents, needed by the servers), "numpy",
+                "bitpacked" or "tiled" (worker processes, synchronous only)
+            rule: Elementary rule applied to the 3 cells above each cell
+            diagram_path: Stream every generation to this file as a space-time
+                diagram (see SpaceTimeWriter)
+            cycle_window: Number of recent lattice hashes kept to detect when a
+                synchronous run repeats (a fixed point has period 1); cycles
+                longer than the window are not detected. 0 (the default) turns
+                detection off: it copies and hashes the lattice every step
+            stop_on_cycle: Stop the run as soon as a cycle is found
+            active_region: With the agents engine, only evaluate the cells whose
+                top neighbors changed in the previous step
+            workers: Number of processes of the tiled engine (one per CPU by default)
+            history_bytes: Keep the recent generations, compressed, in at most
+                this many bytes, for generation() and rewind() (see
+                GenerationHistory); None keeps no history
+            keyframe_interval: Generations between full lattices in the history
+        """
+        super().__init__(seed=seed)
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown scheme {scheme!r}, expected one of {SCHEMES}")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {tuple(ENGINES)}")
+        if scheme == "row_sweep" and engine == "tiled":
+            raise ValueError("The tiled engine only supports the synchronous scheme")
+        if scheme == "row_sweep" and active_region and rule & 1:
+            raise ValueError("active_region needs a rule where 000 stays dead for the row sweep")
+
+        self.width = width
+        self.height = height
+        self.scheme = scheme
+        self.rule = rule
+        self.table = rule_table(rule)
+        self.active_region = active_region
+        self.workers = workers
+
+        states = initial_lattice(self.random, width, height, initial_fraction_alive, scheme)
+        self.engine = ENGINES[engine](self, states)
+
+        # The synchronous scheme writes each generation as a block of height rows,
+        # the row sweep one row per step, starting with the top row
+        self.diagram = None
+        if diagram_path is not None:
+            self.diagram = SpaceTimeWriter(diagram_path, width)
+            if scheme == "row_sweep":
+                self.diagram.append(states[height - 1])
+            else:
+                self.diagram.append(states)
+
+        # Lattice hash -> generation, for the most recent generations
+        self.cycle_window = cycle_window if scheme == "synchronous" else 0
+        self.stop_on_cycle = stop_on_cycle
+        self.seen_states = OrderedDict()
+        self.transient = None  # Generation where the cycle starts
+        self.period = None
+        if self.cycle_window:
+            self.check_cycle(states)
+
+        # Generations too chaotic to compress are computed again from the previous one
+        self.history = None
+        if history_bytes is not None:
+            if scheme == "synchronous":
+                shift, step = 1, partial(step_lattice, rule=rule)
+            else:
+                shift, step = 0, None  # Only one row changes
+            self.history = GenerationHistory((height, width), history_bytes, keyframe_interval, shift, step)
+            self.history.append(0, states)
+
+        self.hashlife = HashLife(rule)
+        self.current_row = height - 2
+        self.running = True
+
+    def step(self):
+        """Advance the model by one step of its update scheme."""
+        if self.scheme == "row_sweep":
+            self.step_row()
+        else:
+            self.step_synchronous()
+
+    def step_synchronous(self):
+        """Perform the model step in two stages:
+
+        - First, all cells assume their next state (whether they will be dead or alive)
+        - Then, all cells change state to their next state.
+        """
+        self.engine.step()
+
+        # Stop hashing once a cycle has been found
+        looking_for_cycle = self.cycle_window and self.period is None
+        if self.diagram is not None or looking_for_cycle or self.history is not None:
+            states = self.lattice()
+            if self.diagram is not None:
+                self.diagram.append(states)
+            if self.history is not None:
+                self.history.append(self.steps, states)
+            if looking_for_cycle:
+                self.check_cycle(states)
+
+    def step_row(self):
+        """Perform the model step for one row only."""
+        # See if there are rows to process
+        if self.current_row < 0:
+            self.running = False
+            if self.diagram is not None:
+                self.diagram.close()
+            return
+
+        # Process only the current row
+        y = self.current_row
+        self.engine.step_row(y)
+
+        if self.diagram is not None:
+            self.diagram.append(self.engine.row(y))
+        if self.history is not None:
+            self.history.append(self.steps, self.lattice())
+
+        # Move to next row (downward)
+        self.current_row -= 1
+
+    def close(self):
+        """Finish the space-time diagram and release the engine (the tiled workers)."""
+        if self.diagram is not None:
+            self.diagram.close()
+        self.engine.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def check_cycle(self, states):
+        """Look the current generation up in the recent hashes.
+
+        On the first repeat, transient and period are set, and the run is
+        stopped if stop_on_cycle is enabled.
+        """
+        key = hashlib.blake2b(np.packbits(states).tobytes(), digest_size=16).digest()
+        generation = self.steps
+        if key in self.seen_states:
+            self.transient = self.seen_states[key]
+            self.period = generation - self.transient
+            self.seen_states.clear()
+            if self.stop_on_cycle:
+                self.running = False
+            return
+
+        self.seen_states[key] = generation
+        if len(self.seen_states) > self.cycle_window:
+            self.seen_states.popitem(last=False)
+
+    def memory_report(self):
+        """Bytes allocated for each agent type (see agent_memory); needs tracemalloc tracing."""
+        return agent_memory(self.agents)
+
+    def lattice(self):
+        """Current states as a (height, width) array, row y at index y."""
+        return self.engine.lattice()
+
+    def generation(self, generation):
+        """(height, width) states of a past generation still in the history."""
+        if self.history is None:
+            raise ValueError("generation needs a history (history_bytes)")
+        return self.history[generation]
+
+    def rewind(self, generation):
+        """Go back to a past generation still in the history.
+
+        The generations after it are forgotten, and the run goes on from there.
+        """
+        if self.history is None:
+            raise ValueError("rewind needs a history (history_bytes)")
+        if self.diagram is not None:
+            raise ValueError("Can't rewind while writing a space-time diagram")
+        states = self.history[generation]
+        self.history.truncate(generation)
+        self.engine.load(states)
+
+        self.steps = generation
+        if self.scheme == "row_sweep":
+            self.current_row = self.height - 2 - generation
+        self.running = True
+
+        # Hash again the generations kept, unless the cycle found was already complete
+        if self.cycle_window and (self.period is None or self.transient + self.period > generation):
+            self.seen_states.clear()
+            self.transient = self.period = None
+            for past in range(max(self.history.first, generation - self.cycle_window + 1), generation + 1):
+                self.steps = past  # check_cycle reads the generation from steps
+                self.check_cycle(self.history[past])
+
+    def row_at(self, generation):
+        """States of the row `generation` rows below the top row in the row sweep.
+
+        Rows keep wrapping around horizontally, so any generation (even far
+        beyond the grid height) can be computed directly with HashLife.
+        """
+        if self.scheme != "row_sweep":
+            raise ValueError("row_at needs the row_sweep scheme")
+        seed_row = self.engine.row(self.height - 1)
+        return np.array(self.hashlife.advance(seed_row, generation), dtype=np.uint8)
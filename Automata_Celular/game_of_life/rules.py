@@ -0,0 +1,40 @@
+import numpy as np
+
+# Cells processed at once, to bound the temporary arrays of large lattices
+CHUNK_CELLS = 1 << 22
+
+
+def rule_table(rule):
+    """Lookup table for an elementary rule, indexed by left*4 + center*2 + right.
+
+    The left, center and right cells are the 3 cells above the updated cell.
+    Rule 90 (the XOR of left and right) is the default of both schemes.
+    """
+    return np.array([(rule >> pattern) & 1 for pattern in range(8)], dtype=np.uint8)
+
+
+def next_rows(above, table):
+    """Next state of the rows below the given rows, wrapping around horizontally."""
+    left = np.roll(above, 1, axis=-1)
+    right = np.roll(above, -1, axis=-1)
+    return table[(left << 2) | (above << 1) | right]
+
+
+def step_rows(src, dst, start, stop, table):
+    """Write rows [start, stop) of the next synchronous generation of src into dst.
+
+    Row y is computed from row y + 1 of src (with wrap-around), so a strip
+    of rows also reads the first row of the next strip, its halo row.
+    """
+    height, width = src.shape
+    chunk = max(1, CHUNK_CELLS // width)
+    for first in range(start, stop, chunk):
+        last = min(first + chunk, stop)
+        dst[first:last] = next_rows(src[np.arange(first + 1, last + 1) % height], table)
+
+
+def step_lattice(states, rule=90):
+    """Next synchronous generation of a whole (height, width) lattice."""
+    following = np.empty_like(states)
+    step_rows(states, following, 0, states.shape[0], rule_table(rule))
+    return following
@@ -0,0 +1,117 @@
+import multiprocessing as mp
+import os
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .rules import rule_table, step_rows
+
+
+def _worker(names, shape, start, stop, table, barrier, conn):
+    """Step one strip of rows every time the parent asks for generations."""
+    memories = [SharedMemory(name=name) for name in names]
+    buffers = [np.ndarray(shape, dtype=np.uint8, buffer=memory.buf) for memory in memories]
+    front = 0
+    try:
+        while True:
+            generations = conn.recv()
+            if generations is None:
+                break
+            for _ in range(generations):
+                step_rows(buffers[front], buffers[1 - front], start, stop, table)
+                front = 1 - front
+                # Nobody reads the new front buffer until every strip is written
+                barrier.wait()
+            conn.send(front)
+    finally:
+        del buffers
+        for memory in memories:
+            memory.close()
+
+
+def _release(processes, connections, memories):
+    """Stop the workers and free the shared buffers."""
+    for conn in connections:
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join()
+    for memory in memories:
+        memory.close()
+        memory.unlink()
+
+
+class TiledLattice:
+    """Synchronous lattice split in strips of rows stepped by a pool of processes.
+
+    The lattice lives in two shared memory buffers (double buffering): every
+    generation each worker reads the front buffer, including the halo row of
+    the next strip, and writes its own strip of the back buffer. A barrier
+    between generations makes the result identical to rules.step_lattice.
+    """
+
+    def __init__(self, states, workers=None, rule=90):
+        """Copy the initial states to shared memory and start the workers.
+
+        Args:
+            states: Initial (height, width) array of 0/1 states
+            workers: Number of processes (one per CPU by default)
+            rule: Elementary rule applied to the 3 cells above each cell
+        """
+        states = np.asarray(states, dtype=np.uint8)
+        self.shape = states.shape
+        height = self.shape[0]
+        workers = min(workers or os.cpu_count(), height)
+        self.workers = workers
+
+        self._memories = [SharedMemory(create=True, size=states.nbytes) for _ in range(2)]
+        self._buffers = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=memory.buf) for memory in self._memories
+        ]
+        self._buffers[0][:] = states
+        self.front = 0
+
+        bounds = np.linspace(0, height, workers + 1).astype(int)
+        # Kept alive here until the workers (possibly spawned) have attached to it
+        self._barrier = mp.Barrier(workers)
+        table = rule_table(rule)
+        names = [memory.name for memory in self._memories]
+        self._processes = []
+        self._connections = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = mp.Pipe()
+            process = mp.Process(
+                target=_worker,
+                args=(names, self.shape, int(start), int(stop), table, self._barrier, child),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            self._connections.append(parent)
+
+        self._finalizer = weakref.finalize(
+            self, _release, self._processes, self._connections, self._memories
+        )
+
+    def run(self, generations=1):
+        """Advance the lattice by the given number of generations."""
+        for conn in self._connections:
+            conn.send(generations)
+        for conn in self._connections:
+            self.front = conn.recv()
+
+    def states(self):
+        """Copy of the current (height, width) lattice."""
+        return self._buffers[self.front].copy()
+
+    def load(self, states):
+        """Replace the current lattice; the workers read it on the next run."""
+        self._buffers[self.front][:] = states
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        self._buffers = []
+        self._finalizer()
@@ -1,6 +1,7 @@
 from random_agents.agent import RandomAgent, ObstacleAgent, RechargeStationAgent, TrashAgent
 from random_agents.model import RandomModel
 
+import solara
 from mesa.visualization import (
     Slider,
     SolaraViz,
@@ -72,14 +73,6 @@ model_params = {
     "max_time": Slider("Max Time Steps", 1000, 100, 5000, 100),
 }
 
-# Create the model using the initial parameters from the settings
-model = RandomModel(
-    num_agents=model_params["num_agents"].value,
-    width=model_params["width"].value,
-    height=model_params["height"].value,
-    seed=model_params["seed"]["value"]
-)
-
 # Create the space component
 space_component = make_space_component(
     random_portrayal,
@@ -98,10 +91,23 @@ lineplot_component_2 = make_plot_component(
     post_process=post_process_lines,
 )
 
-# Create the SolaraViz page
-page = SolaraViz(
-    model,
-    components=[space_component, lineplot_component_1, lineplot_component_2],
-    model_params=model_params,
-    name="Random Model",
-)
\ No newline at end of file
+def create_model():
+    """Create the model using the initial parameters from the settings."""
+    return RandomModel(
+        num_agents=model_params["num_agents"].value,
+        width=model_params["width"].value,
+        height=model_params["height"].value,
+        seed=model_params["seed"]["value"]
+    )
+
+# Create the SolaraViz page, with a model built on its first render
+# (importing this module doesn't build one)
+@solara.component
+def Page():
+    model = solara.use_memo(create_model, dependencies=[])
+    SolaraViz(
+        model,
+        components=[space_component, lineplot_component_1, lineplot_component_2],
+        model_params=model_params,
+        name="Random Model",
+    )
@@ -0,0 +1,93 @@
+"""Throughput of ApproximateShardedRoomba for an increasing number of worker
+processes, and how far its results are from RandomModel(synchronous=True),
+whose rules it follows, on the same floor.
+
+Speedup is reported two ways:
+- wall: elapsed time of 1 worker / elapsed time of n workers. This is the
+  measured scaling, but it can't go over the number of CPUs of the machine
+- CPU: CPU time of 1 worker / critical path of n workers (the sum over
+  phases of the slowest worker). It is only an estimate, and an upper
+  bound, of the wall speedup with a CPU per worker: it leaves out the
+  barriers, the pipes and the contention for memory. Rows marked
+  "estimate" have more workers than CPUs; run on a larger machine to
+  measure them
+
+Usage: python benchmark_sharded.py [width] [height] [robots] [ticks] [max workers]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from random_agents.agent import RandomAgent
+from random_agents.model import RandomModel
+from random_agents.sharded import ApproximateShardedRoomba
+
+
+def scaling(width, height, robots, ticks, max_workers):
+    print(f"{width}x{height} floor, {robots} robots, {ticks} ticks, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'seconds':>8} {'robot steps/s':>14} {'wall speedup':>12} {'CPU speedup':>11}")
+    expected = None
+    workers = 1
+    while workers <= max_workers:
+        # The same strips for every worker count, so the runs must be identical
+        model = ApproximateShardedRoomba.random(robots, width, height, seed=42, max_time=ticks, workers=workers)
+        model.run(1)  # Warm up the workers
+        start = time.perf_counter()
+        model.run(ticks - 1)
+        elapsed = time.perf_counter() - start
+        critical_path = model.phase_seconds.max(axis=0).sum()
+        result = model.robots()
+        model.close()
+
+        if expected is None:
+            expected, serial_wall, serial_cpu = result, elapsed, critical_path
+        assert all(np.array_equal(result[name], expected[name]) for name in expected), "sharded result differs"
+
+        throughput = robots * (ticks - 1) / elapsed
+        note = " estimate" if workers > os.cpu_count() else ""
+        print(f"{workers:>7} {elapsed:8.2f} {throughput:14.0f} {serial_wall / elapsed:12.2f} "
+              f"{serial_cpu / critical_path:11.2f}{note}")
+        workers *= 2
+
+
+def summary(history, robots):
+    """Ticks and last metrics of a run (history has a row per tick and one at the start), and its dead robots."""
+    last = history[-1]
+    return (f"{len(history) - 1:5d} {last['Percentage Clean']:8.1f} {last['Battery']:8.1f} "
+            f"{last['Total Movements']:10d} {int(np.count_nonzero(robots)):5d}")
+
+
+def approximation(width=40, height=40, robots=20, ticks=300, seeds=(1, 2, 3)):
+    """Both simulators from the same RandomModel layout and robots, in synchronous mode."""
+    print(f"\n{width}x{height} floor, {robots} robots, {ticks} ticks, same layout in both")
+    print(f"{'simulator':<24} {'seed':>4} {'ticks':>5} {'% clean':>8} {'battery':>8} {'movements':>10} {'dead':>5}")
+    for seed in seeds:
+        model = RandomModel(robots, width, height, seed=seed, max_time=ticks, synchronous=True)
+        approximate = ApproximateShardedRoomba.from_model(model, workers=1)
+        while model.running:
+            model.step()
+        while approximate.running:
+            approximate.step()
+        history = model.datacollector.get_model_vars_dataframe().to_dict("records")
+        dead = [a.dead for a in model.agents if isinstance(a, RandomAgent)]
+        print(f"{'RandomModel':<24} {seed:>4} {summary(history, dead)}")
+        print(f"{'ApproximateShardedRoomba':<24} {seed:>4} "
+              f"{summary(approximate.history, approximate.robots()['dead'])}")
+        approximate.close()
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    robots = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    ticks = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    max_workers = int(sys.argv[5]) if len(sys.argv) > 5 else 8
+
+    scaling(width, height, robots, ticks, max_workers)
+    approximation()
+
+
+if __name__ == "__main__":
+    main()
@@ -21,8 +21,8 @@ class RandomAgent(CellAgent):
         self._battery = 100
         self.path_to_station = []  # Store of path to recharge station
         self.in_crisis = False  # If battery is low
-        self.visited_cells = set()  # To keep track of visited cells
         self.path_to_trash = []  # Store of path to nearest trash
+        self.path_to_frontier = []  # Store of path to the nearest unexplored cells
         self.dead = False
 
         # Metrics to collect
@@ -40,7 +40,6 @@ class RandomAgent(CellAgent):
             # Check if the next cell is occupied by another agent
             if not any(isinstance(a, RandomAgent) for a in next_cell.agents):
                 self.cell = next_cell
-                self.visited_cells.add(self.cell.coordinate)
                 self._battery -= 1
                 self.steps_taken += 1
             else:
@@ -58,7 +57,6 @@ class RandomAgent(CellAgent):
             next_cell = self.path_to_trash.pop(0)
             if not any(isinstance(a, RandomAgent) for a in next_cell.agents):
                 self.cell = next_cell
-                self.visited_cells.add(self.cell.coordinate)
             else:
                 self.path_to_trash = []
         else:
@@ -72,52 +70,55 @@ class RandomAgent(CellAgent):
                 # Move towards trash
                 self.cell = trash_neighbors.select_random_cell()
             else:
-                # Prefer unvisited cells
-                next_moves = self.cell.neighborhood.select(
-                    lambda cell: (cell.is_empty or
-                    any(isinstance(a, RechargeStationAgent) for a in cell.agents)) and
-                    cell.coordinate not in self.visited_cells and 
-                    not any(isinstance(a, RandomAgent) for a in cell.agents)
-                )
-                
-                # If all neighbors are visited, go to any valid cell
-                if len(next_moves.cells) == 0:
-                    next_moves = self.cell.neighborhood.select(
-                        lambda cell: (cell.is_empty or
-                        any(isinstance(a, RechargeStationAgent) for a in cell.agents)) and
-                        not any(isinstance(a, RandomAgent) for a in cell.agents)
-                    )
-                
-                if len(next_moves.cells) > 0:
-                    self.cell = next_moves.select_random_cell()
-                    self.visited_cells.add(self.cell.coordinate)
+                # Head for the cells no robot of the fleet has visited yet
+                self.explore_frontier()
     
         self._battery -= 1
         self.steps_taken += 1
 
+    def explore_frontier(self):
+        """
+        Moves towards the nearest frontier (unvisited cells next to visited ones)
+        that no other robot is heading to, using the coverage map shared by the fleet.
+        Once the whole floor has been visited, moves to the least recently visited neighbor.
+        """
+        # Plan again if the path is used up or the robot was moved off it
+        if self.path_to_frontier:
+            x, y = self.cell.coordinate
+            next_x, next_y = self.path_to_frontier[0].coordinate
+            if max(abs(next_x - x), abs(next_y - y)) != 1:
+                self.path_to_frontier = []
+        if not self.path_to_frontier:
+            self.path_to_frontier = self.model.frontier_path(self) or []
+
+        if self.path_to_frontier:
+            next_cell = self.path_to_frontier.pop(0)
+            if not any(isinstance(a, RandomAgent) for a in next_cell.agents):
+                self.cell = next_cell
+            else:
+                # If occupied, plan again next time
+                self.path_to_frontier = []
+            return
+
+        # Patrol: go to the valid neighbor visited longest ago
+        next_moves = self.cell.neighborhood.select(
+            lambda cell: ((cell.is_empty and not cell.obstacle) or
+            any(isinstance(a, RechargeStationAgent) for a in cell.agents)) and
+            not any(isinstance(a, RandomAgent) for a in cell.agents)
+        )
+        if len(next_moves.cells) > 0:
+            last_visit = self.model.grid.last_visit.data
+            oldest = min(last_visit[cell.coordinate] for cell in next_moves.cells)
+            next_moves = next_moves.select(lambda cell: last_visit[cell.coordinate] == oldest)
+            self.cell = next_moves.select_random_cell()
+
 
     def recharge(self):
         """
         Recharges the agent
         """
-        # Check if there's another RandomAgent in this station
-        other_agents = [a for a in self.cell.agents 
-                    if isinstance(a, RandomAgent) and a != self]
-        
-        if other_agents:
-        # If there's another agent, only the one with less battery charges
-            if self._battery >= 100:
-                # If fully charged, leave
-                self.in_crisis = False
-                self.path_to_station = []
-                self.path_to_trash = []
-                return
-            elif self._battery > other_agents[0]._battery:
-                # If I have more battery than the other agent, don't charge (wait)
-                return
-        
-        # Only charge if alone in the station
-        if self._battery < 100:
+        # Only the first robot of the station's queue charges, the rest wait
+        if self._battery < 100 and self.model.stations.charging(self):
             self._battery = min(100, self._battery + 5)
             self.recharges += 1
         
@@ -126,6 +127,7 @@ class RandomAgent(CellAgent):
             self.in_crisis = False
             self.path_to_station = []
             self.path_to_trash = []
+            self.model.stations.release(self)
 
 
     def clean(self):
@@ -146,31 +148,29 @@ class RandomAgent(CellAgent):
         """
         Happens when battery is low
         """
-        # If there is no path, calculate it
+        # If there is no path, reserve the station where charging starts first
         if not self.path_to_station:
-            self.path_to_station = self.dijkstra(self.cell, RechargeStationAgent)
+            self.path_to_station = self.model.stations.assign(self)
         
         # If there is a path, follow it
         if self.path_to_station:
             next_cell = self.path_to_station[0]  # Peek at next cell
             
-            # Check if next cell is occupied by another RandomAgent
-            if any(isinstance(a, RandomAgent) for a in next_cell.agents):
-                # If the next cell or destination is occupied, find alternative station
-                destination = self.path_to_station[-1] if self.path_to_station else None
-                if destination and any(isinstance(a, RandomAgent) for a in destination.agents):
-                    # Find an unoccupied station
-                    alternative_path = self.find_unoccupied_station()
-                    if alternative_path:
-                        self.path_to_station = alternative_path
-                        next_cell = self.path_to_station.pop(0)
-                        self.cell = next_cell
-                    else:
-                        # Wait if no alternative found
-                        self.path_to_station = []
-                else:
-                    # Just wait this turn
-                    pass
+            # Robots queue on their station, but step around any other one in the way
+            if (len(self.path_to_station) > 1 and
+                    any(isinstance(a, RandomAgent) for a in next_cell.agents)):
+                x, y = self.path_to_station[1].coordinate
+                detour = self.cell.neighborhood.select(
+                    lambda cell: cell.is_empty and not cell.obstacle and
+                    max(abs(cell.coordinate[0] - x), abs(cell.coordinate[1] - y)) == 1
+                )
+                if len(detour.cells) > 0:
+                    self.cell = detour.select_random_cell()
+                    self.path_to_station.pop(0)
+                elif any(a.in_crisis for a in next_cell.agents if isinstance(a, RandomAgent)):
+                    # The robot in the way is charging or queuing: plan again around it
+                    self.path_to_station = self.model.stations.assign(self)
+                # Otherwise just wait this turn
                 self._battery -= 1
                 self.steps_taken += 1
             else:
@@ -182,57 +182,13 @@ class RandomAgent(CellAgent):
             # If there is no path, the agent dies
             self.die()
 
-    def find_unoccupied_station(self):
-        """
-        Find the nearest unoccupied recharge station
-        Returns: path to nearest unoccupied station or None
-        """
-        counter = 0
-        pq = [(0, counter, self.cell)]
-        distances = {self.cell: 0}
-        previous = {self.cell: None}
-        visited = set()
-        
-        while pq:
-            current_dist, _, current_cell = heapq.heappop(pq)
-            
-            if current_cell in visited:
-                continue
-                
-            visited.add(current_cell)
-            
-            # Check if this is an unoccupied recharge station
-            if any(isinstance(a, RechargeStationAgent) for a in current_cell.agents):
-                # Check if it's not occupied by another RandomAgent
-                if not any(isinstance(a, RandomAgent) for a in current_cell.agents):
-                    # Reconstruct path
-                    path = []
-                    while current_cell is not None:
-                        path.append(current_cell)
-                        current_cell = previous[current_cell]
-                    path.reverse()
-                    return path[1:]  # Exclude current cell
-            
-            # Explore neighbors
-            for neighbor in current_cell.neighborhood.cells:
-                if neighbor not in visited:
-                    if neighbor.is_empty or any(isinstance(a, RechargeStationAgent) for a in neighbor.agents):
-                        new_dist = current_dist + 1
-                        
-                        if neighbor not in distances or new_dist < distances[neighbor]:
-                            distances[neighbor] = new_dist
-                            previous[neighbor] = current_cell
-                            counter += 1
-                            heapq.heappush(pq, (new_dist, counter, neighbor))
-        
-        return None
-
     def die(self):
         """
         Removes the agent from the grid and from the model
         """
         self.dead = True
         self._battery = 0
+        self.model.stations.release(self)
 
         alive_agents = [a for a in self.model.agents if isinstance(a, RandomAgent) and not a.dead]
 
@@ -252,7 +208,9 @@ class RandomAgent(CellAgent):
                 self.clean()
             # Check if on recharge station
             elif any(isinstance(a, RechargeStationAgent) for a in self.cell.agents):
-                if self.in_crisis or self._battery < 100:
+                # Robots passing by only top up at stations nobody else reserved
+                if self.in_crisis or (self._battery < 100 and
+                        not self.model.stations.reserved_by_others(self)):
                     self.recharge()
                 else:
                     self.explore()
@@ -265,66 +223,19 @@ class RandomAgent(CellAgent):
         else:
             self.die()
 
-    def dijkstra(self, start_cell, goal_type):  
-        """
-        Dijkstra Algorithm to find path to recharge station
-        Args:
-            start_cell: Initial cell
-            goal_type: Target agent type (RechargeStationAgent)
-        Returns:
-            List of cells forming the shortest path
-        """
-        # Counter for tie breaking
-        counter = 0
-        # Priority Queue: (distance, counter, cell)
-        pq = [(0, counter ,start_cell)]
-        # Distance dictionary
-        distances = {start_cell: 0}
-        # Dictionary to reconstruct the path
-        previous = {start_cell: None}
-        # Set of visited cells
-        visited = set()
-        
-        while pq:
-            current_dist, _, current_cell = heapq.heappop(pq)
-            
-            if current_cell in visited:
-                continue
-                
-            visited.add(current_cell)
-            
-            # If recharge station is found, reconstruct the path
-            if any(isinstance(a, goal_type) for a in current_cell.agents):
-                path = []
-                while current_cell is not None:
-                    path.append(current_cell)
-                    current_cell = previous[current_cell]
-                path.reverse()
-                return path[1:]  # Exclude the current cell
-            
-            # Explore neighbors
-            for neighbor in current_cell.neighborhood.cells:
-                # Only consider empty cells or recharge stations
-                if neighbor not in visited:
-                    # Check that the cell does not have obstacles
-                    if neighbor.is_empty or any(isinstance(a, RechargeStationAgent) for a in neighbor.agents):
-                        # Distance = 1 for each step
-                        new_dist = current_dist + 1
-                        
-                        if neighbor not in distances or new_dist < distances[neighbor]:
-                            distances[neighbor] = new_dist
-                            previous[neighbor] = current_cell
-                            counter += 1
-                            heapq.heappush(pq, (new_dist, counter, neighbor))
-        
-        # If there is no path to recharge station, return empty list
-        return []
-    
+        # Record the visit in the coverage map shared by the fleet
+        if not self.dead:
+            self.model.grid.last_visit.data[self.cell.coordinate] = self.model.steps
+
     def find_nearest_trash(self, max_distance=5):
         """
         Find the nearest trash within max_distance using BFS
         Returns: path to nearest trash or None
         """
+        # Use the path found by the model's batched search this tick, if any
+        if self in self.model.trash_plans:
+            return self.model.trash_plans.pop(self)
+
         queue = deque([(self.cell, 0)])
         visited = {self.cell}
         
@@ -343,7 +254,7 @@ class RandomAgent(CellAgent):
             for neighbor in current_cell.neighborhood.cells:
                 if neighbor not in visited:
                     # Only explore empty cells, trash cells, or recharge stations
-                    if (neighbor.is_empty or 
+                    if ((neighbor.is_empty and not neighbor.obstacle) or 
                         any(isinstance(a, (TrashAgent, RechargeStationAgent)) for a in neighbor.agents)):
                         visited.add(neighbor)
                         queue.append((neighbor, distance + 1))
@@ -385,7 +296,7 @@ class RandomAgent(CellAgent):
             for neighbor in current_cell.neighborhood.cells:
                 if neighbor not in visited:
                     # Can move through empty cells, trash, or recharge stations
-                    if (neighbor.is_empty or 
+                    if ((neighbor.is_empty and not neighbor.obstacle) or 
                         any(isinstance(a, (TrashAgent, RechargeStationAgent)) for a in neighbor.agents)):
                         new_dist = current_dist + 1
                         
@@ -417,6 +328,9 @@ class TrashAgent(FixedAgent):
         self.cell=cell
 
     def disappear(self):
+        self.model.grid.trash.data[self.cell.coordinate] = False
+        if self.model.planner is not None:
+            self.model.planner.update(self.cell.coordinate, True)
         self.remove()
 
     def step(self):
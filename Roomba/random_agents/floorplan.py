@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import numpy as np
+
+# Legend of ASCII maps; any other character is free floor
+WALL = "#"
+STATION = "S"
+TRASH = "T"
+
+IMAGE_SUFFIXES = {".png", ".bmp", ".gif", ".pgm", ".tif", ".tiff"}
+
+
+class Floorplan:
+    """
+    Static layout of a floor, as [x, y] layers (y grows upwards, so the first
+    row of a file is the top row of the grid).
+    Attributes:
+        obstacle: bool layer of walls and furniture
+        station: bool layer of recharge stations, or None to place them at random
+        trash: bool layer of trash, or None to scatter it at random
+    """
+
+    def __init__(self, obstacle, station=None, trash=None):
+        self.obstacle = obstacle
+        self.station = station
+        self.trash = trash
+
+    @property
+    def width(self):
+        return self.obstacle.shape[0]
+
+    @property
+    def height(self):
+        return self.obstacle.shape[1]
+
+    def free_cells(self):
+        """(N, 2) array with the (x, y) of every cell without obstacles."""
+        return np.argwhere(~np.asarray(self.obstacle))
+
+    def save(self, path):
+        """
+        Write the obstacles as a bool .npy image, which load_floorplan maps
+        without copying: batch workers loading it share the same pages.
+        """
+        np.save(path, np.ascontiguousarray(_to_image(np.asarray(self.obstacle))))
+
+
+def _to_layer(image):
+    """[x, y] view of a (rows, columns) image whose first row is the top one."""
+    return image[::-1].T
+
+
+def _to_image(layer):
+    return layer.T[::-1]
+
+
+def load_floorplan(path, threshold=128):
+    """
+    Load a floorplan from a file.
+    Args:
+        path: ASCII map (see WALL, STATION and TRASH), .npy occupancy array
+            (nonzero is an obstacle) or occupancy image (dark is an obstacle)
+        threshold: Gray level under which an image pixel is an obstacle
+    Returns: Floorplan; .npy arrays are memory-mapped read-only, and bool ones
+        are used as they are, without loading them
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".npy":
+        image = np.load(path, mmap_mode="r")
+        if image.ndim != 2:
+            raise ValueError(f"{path} is not a 2D occupancy array")
+        if image.dtype != bool:
+            image = image != 0
+        return Floorplan(_to_layer(image))
+
+    if suffix in IMAGE_SUFFIXES:
+        # Pillow is only needed for images
+        from PIL import Image
+
+        with Image.open(path) as picture:
+            image = np.asarray(picture.convert("L")) < threshold
+        return Floorplan(_to_layer(image))
+
+    rows = path.read_text().splitlines()
+    while rows and not rows[-1].strip():
+        rows.pop()
+    if not rows:
+        raise ValueError(f"{path} is an empty map")
+    width = max(len(row) for row in rows)
+    grid = np.array([list(row.ljust(width)) for row in rows])
+    station = _to_layer(grid == STATION)
+    trash = _to_layer(grid == TRASH)
+    return Floorplan(
+        _to_layer(grid == WALL),
+        station=station if station.any() else None,
+        trash=trash if trash.any() else None,
+    )
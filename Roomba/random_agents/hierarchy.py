@@ -0,0 +1,346 @@
+import heapq
+import math
+from collections import deque
+
+import numpy as np
+
+from .planning import moore_graph
+
+# Cluster offsets whose shared border is stored under (cluster, cluster + offset)
+FORWARD = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+
+class HierarchicalPlanner:
+    """
+    Hierarchical pathfinding (HPA*) over a [x, y] passable layer.
+
+    The floor is split into square clusters. Every open stretch of a border
+    between two clusters gets one entrance (a pair of cells, one on each
+    side). Entrances and landmarks (cells searches can end at, like recharge
+    stations) are the nodes of an abstract graph: nodes of the same cluster
+    are linked by their distance inside the cluster, and the two cells of an
+    entrance by one step. Searches run on the abstract graph, and their paths
+    are turned into cells only as they are walked (see LazyPath).
+
+    Paths must go through entrances and stay inside each cluster between
+    them, so they can be a few steps longer than the shortest path.
+    """
+
+    def __init__(self, passable, landmarks=(), cluster_size=16):
+        """
+        Args:
+            passable: [x, y] bool layer of the cells robots can move through
+            landmarks: (x, y) coordinates searches can end at
+            cluster_size: Side of the square clusters, in cells
+        """
+        self.passable = np.array(passable, dtype=bool)
+        self.width, self.height = self.passable.shape
+        self.size = cluster_size
+        self.clusters = (math.ceil(self.width / cluster_size), math.ceil(self.height / cluster_size))
+
+        self.landmarks = {}  # Cluster -> landmark coordinates in it
+        for landmark in landmarks:
+            self.landmarks.setdefault(self.cluster_of(landmark), set()).add(tuple(landmark))
+
+        self.entrances = {}  # (cluster, cluster + FORWARD offset) -> list of (cell, cell) pairs
+        self.links = {}  # Node -> nodes one step away in other clusters
+        self.edges = {}  # Cluster -> {node: {node: distance inside the cluster}}
+        self._graphs = {}  # Cluster -> cached cell graph (see _graph)
+
+        for cx in range(self.clusters[0]):
+            for cy in range(self.clusters[1]):
+                for dx, dy in FORWARD:
+                    if self._exists((cx + dx, cy + dy)):
+                        self._set_entrances(((cx, cy), (cx + dx, cy + dy)))
+        for cx in range(self.clusters[0]):
+            for cy in range(self.clusters[1]):
+                self._connect((cx, cy))
+
+    def cluster_of(self, coordinate):
+        return (coordinate[0] // self.size, coordinate[1] // self.size)
+
+    def _exists(self, cluster):
+        return 0 <= cluster[0] < self.clusters[0] and 0 <= cluster[1] < self.clusters[1]
+
+    def _bounds(self, cluster):
+        """(x0, x1, y0, y1) bounds of the cells of a cluster, end excluded."""
+        x0, y0 = cluster[0] * self.size, cluster[1] * self.size
+        return x0, min(x0 + self.size, self.width), y0, min(y0 + self.size, self.height)
+
+    def _borders(self, cluster):
+        """Keys of the entrances of every border of a cluster."""
+        cx, cy = cluster
+        for dx, dy in FORWARD:
+            for key in [(cluster, (cx + dx, cy + dy)), ((cx - dx, cy - dy), cluster)]:
+                if self._exists(key[0]) and self._exists(key[1]):
+                    yield key
+
+    def _find_entrances(self, a, b):
+        """Entrance cell pairs between cluster a and cluster b = a + FORWARD offset."""
+        p = self.passable
+        ax0, ax1, ay0, ay1 = self._bounds(a)
+        offset = (b[0] - a[0], b[1] - a[1])
+
+        if offset in [(1, 1), (1, -1)]:
+            # Corner: only needed when no cell of the other two clusters joins them
+            x = ax1 - 1
+            y = ay1 - 1 if offset == (1, 1) else ay0
+            corner, other = (x, y), (x + offset[0], y + offset[1])
+            if p[corner] and p[other] and not p[x + 1, y] and not p[x, y + offset[1]]:
+                return [(corner, other)]
+            return []
+
+        # The cells of both sides of the border, in order along it
+        if offset == (1, 0):
+            side_a = [(ax1 - 1, y) for y in range(ay0, ay1)]
+            side_b = [(ax1, y) for y in range(ay0, ay1)]
+        else:
+            side_a = [(x, ay1 - 1) for x in range(ax0, ax1)]
+            side_b = [(x, ay1) for x in range(ax0, ax1)]
+        open_a = [p[cell] for cell in side_a]
+        open_b = [p[cell] for cell in side_b]
+
+        # One entrance in the middle of every stretch where both sides are open
+        pairs = []
+        start = None
+        for i in range(len(side_a) + 1):
+            if i < len(side_a) and open_a[i] and open_b[i]:
+                if start is None:
+                    start = i
+            elif start is not None:
+                middle = (start + i - 1) // 2
+                pairs.append((side_a[middle], side_b[middle]))
+                start = None
+
+        # Diagonal crossings that no straight one next to them can replace
+        for i in range(len(side_a) - 1):
+            if open_a[i] and open_b[i + 1] and not open_b[i] and not open_a[i + 1]:
+                pairs.append((side_a[i], side_b[i + 1]))
+            if open_a[i + 1] and open_b[i] and not open_b[i + 1] and not open_a[i]:
+                pairs.append((side_a[i + 1], side_b[i]))
+        return pairs
+
+    def _set_entrances(self, key):
+        """(Re)compute the entrances of a border and their links."""
+        for a, b in self.entrances.get(key, []):
+            self.links[a].discard(b)
+            self.links[b].discard(a)
+        self.entrances[key] = self._find_entrances(*key)
+        for a, b in self.entrances[key]:
+            self.links.setdefault(a, set()).add(b)
+            self.links.setdefault(b, set()).add(a)
+
+    def _graph(self, cluster):
+        """
+        Graph of the passable cells of a cluster.
+        Returns: (sparse adjacency matrix, [x, y] array of cell ids or -1, (x, y) of each id)
+        """
+        if cluster not in self._graphs:
+            x0, x1, y0, y1 = self._bounds(cluster)
+            block = self.passable[x0:x1, y0:y1]
+            graph, ids = moore_graph(block)
+            cells = [(int(x) + x0, int(y) + y0) for x, y in np.argwhere(block)]
+            self._graphs[cluster] = (graph, ids, cells)
+        return self._graphs[cluster]
+
+    def _cell_id(self, cluster, coordinate):
+        x0, _, y0, _ = self._bounds(cluster)
+        return self._graph(cluster)[1][coordinate[0] - x0, coordinate[1] - y0]
+
+    def _nodes(self, cluster):
+        """Landmarks and entrance cells of a cluster."""
+        nodes = set(self.landmarks.get(cluster, ()))
+        for key in self._borders(cluster):
+            for pair in self.entrances[key]:
+                nodes.update(cell for cell in pair if self.cluster_of(cell) == cluster)
+        return [node for node in nodes if self.passable[node]]
+
+    def _distances(self, cluster, sources, targets):
+        """Distances inside a cluster from every source to every target: {source: {target: distance}}."""
+        from scipy.sparse.csgraph import shortest_path
+
+        graph = self._graph(cluster)[0]
+        sources = [cell for cell in sources if self._cell_id(cluster, cell) >= 0]
+        if not sources:
+            return {}
+        source_ids = [self._cell_id(cluster, cell) for cell in sources]
+        target_ids = [self._cell_id(cluster, cell) for cell in targets]
+        table = shortest_path(graph, method="D", unweighted=True, indices=source_ids).reshape(len(sources), -1)
+        return {
+            source: {
+                target: int(table[i, j]) for target, j in zip(targets, target_ids)
+                if target != source and np.isfinite(table[i, j])
+            }
+            for i, source in enumerate(sources)
+        }
+
+    def _connect(self, cluster):
+        """(Re)compute the abstract edges between the nodes of a cluster."""
+        nodes = self._nodes(cluster)
+        self.edges[cluster] = self._distances(cluster, nodes, nodes) if nodes else {}
+
+    def update(self, coordinate, passable):
+        """
+        Change the passability of one cell (e.g. when trash is cleaned).
+        Only the cluster of the cell is reconnected, plus the neighbors whose
+        entrances changed when the cell is on a border.
+        """
+        self.passable[coordinate] = passable
+        cluster = self.cluster_of(coordinate)
+        x0, x1, y0, y1 = self._bounds(cluster)
+        touched = {cluster}
+        if coordinate[0] in (x0, x1 - 1) or coordinate[1] in (y0, y1 - 1):
+            # Corner entrances between two neighbors depend on the cells of this cluster too
+            keys = {
+                key
+                for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                if self._exists((cluster[0] + dx, cluster[1] + dy))
+                for key in self._borders((cluster[0] + dx, cluster[1] + dy))
+            }
+            for key in keys:
+                before = self.entrances[key]
+                self._set_entrances(key)
+                if self.entrances[key] != before:
+                    touched.update(key)
+        for other in touched:
+            self._graphs.pop(other, None)
+            self._connect(other)
+
+    def search(self, start, goals, stop):
+        """
+        A* over the abstract graph that reports goals by distance.
+
+        The estimate is the Chebyshev distance to the nearest goal, a lower
+        bound of the steps left with Moore moves, so goals still come out in
+        order of distance.
+        Args:
+            start: (x, y) coordinate of the robot
+            goals: Set of landmark coordinates
+            stop: Called with (coordinate, distance) for every goal reached, in
+                order of distance; the search ends when it returns True
+        Returns:
+            Dictionary from every reached node to (previous node, distance
+            between them), for path
+        """
+        start = tuple(start)
+        cluster = self.cluster_of(start)
+        local = self._distances(cluster, [start], self._nodes(cluster)).get(start, {})
+        if not goals:
+            return {start: None}
+
+        def estimate(node):
+            x, y = node
+            return min(max(abs(x - gx), abs(y - gy)) for gx, gy in goals)
+
+        best = {start: 0}
+        previous = {start: None}
+        heap = [(estimate(start), 0, start)]
+        while heap:
+            _, distance, node = heapq.heappop(heap)
+            if distance > best[node]:
+                continue
+            if node in goals and stop(node, distance):
+                break
+
+            inside = local if node == start else self.edges[self.cluster_of(node)].get(node, {})
+            steps = list(inside.items()) + [(other, 1) for other in self.links.get(node, ())]
+            for neighbor, cost in steps:
+                if distance + cost < best.get(neighbor, math.inf):
+                    best[neighbor] = distance + cost
+                    previous[neighbor] = (node, cost)
+                    heapq.heappush(heap, (distance + cost + estimate(neighbor), distance + cost, neighbor))
+        return previous
+
+    def path(self, previous, goal, grid):
+        """Lazy path of grid cells to a goal reached by search."""
+        waypoints = []
+        while previous[goal] is not None:
+            node, cost = previous[goal]
+            waypoints.append((goal, cost))
+            goal = node
+        waypoints.reverse()
+        return LazyPath(self, grid, goal, waypoints)
+
+    def segment(self, start, end):
+        """
+        Cells from start (excluded) to end along an abstract edge, or None if
+        the cells between them are no longer connected.
+        """
+        from scipy.sparse.csgraph import shortest_path
+
+        cluster = self.cluster_of(start)
+        if cluster != self.cluster_of(end):
+            return [end]
+
+        graph, _, cells = self._graph(cluster)
+        source, target = self._cell_id(cluster, start), self._cell_id(cluster, end)
+        if source < 0 or target < 0:
+            return None
+        _, predecessors = shortest_path(
+            graph, method="D", unweighted=True, indices=source, return_predecessors=True
+        )
+        if target != source and predecessors[target] < 0:
+            return None
+        cell_ids = []
+        while target != source:
+            cell_ids.append(target)
+            target = predecessors[target]
+        return [cells[i] for i in reversed(cell_ids)]
+
+
+class LazyPath:
+    """
+    Path of grid cells through the nodes of a HierarchicalPlanner search,
+    refined one abstract edge at a time as it is walked. Supports what the
+    agents do with their list paths: len, truth value, indexing and pop(0).
+    """
+
+    def __init__(self, planner, grid, start, waypoints):
+        """
+        Args:
+            planner: HierarchicalPlanner the path was found with
+            grid: Grid to take the cells from
+            start: (x, y) coordinate the path starts at (excluded)
+            waypoints: List of (node, distance from the previous node)
+        """
+        self.planner = planner
+        self.grid = grid
+        self.last = start  # Last refined coordinate
+        self.cells = deque()  # Refined coordinates not walked yet
+        self.waypoints = deque(waypoints)
+        self.length = sum(cost for _, cost in waypoints)
+
+    def _refine(self, count):
+        """Refine abstract edges until count cells are known (or the path ends)."""
+        while len(self.cells) < count and self.waypoints:
+            node, cost = self.waypoints.popleft()
+            segment = self.planner.segment(self.last, node)
+            if segment is None:
+                # The floor changed under the path: it ends here
+                self.waypoints.clear()
+                self.length = len(self.cells)
+                return
+            self.cells.extend(segment)
+            self.last = node
+            # The cluster may have opened up since the search
+            self.length += len(segment) - cost
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        self._refine(index + 1)
+        if not 0 <= index < len(self.cells):
+            raise IndexError("path index out of range")
+        return self.grid[self.cells[index]]
+
+    def pop(self, index=0):
+        """Remove and return the next cell (only index 0 is supported)."""
+        if index != 0:
+            raise ValueError("LazyPath only pops its first cell")
+        cell = self[0]
+        self.cells.popleft()
+        self.length -= 1
+        return cell
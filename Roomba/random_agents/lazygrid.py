@@ -0,0 +1,101 @@
+from mesa.discrete_space import Cell, CellCollection, OrthogonalMooreGrid
+from mesa.discrete_space.grid import Grid
+
+# Moore neighborhood, in the order OrthogonalMooreGrid connects cells (the
+# order of cell.neighborhood, and so of its random selections)
+OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+_connections = Cell.connections  # Slot the connections are stored in
+
+
+class LazyCell(Cell):
+    """
+    Cell that is connected to its neighbors (creating them) the first time
+    its connections are read.
+    """
+    __slots__ = ()
+    grid = None  # Set on the cell class of each LazyMooreGrid
+
+    @property
+    def connections(self):
+        connections = _connections.__get__(self)
+        if not connections:
+            x, y = self.coordinate
+            width, height = self.grid.dimensions
+            for dx, dy in OFFSETS:
+                if 0 <= x + dx < width and 0 <= y + dy < height:
+                    connections[dx, dy] = self.grid[x + dx, y + dy]
+        return connections
+
+    @connections.setter
+    def connections(self, value):
+        _connections.__set__(self, value)
+
+
+class _Cells(dict):
+    """Cells of a LazyMooreGrid by coordinate, created on first access."""
+
+    def __init__(self, grid):
+        super().__init__()
+        self.grid = grid
+
+    def __missing__(self, coordinate):
+        x, y = coordinate
+        width, height = self.grid.dimensions
+        if not (0 <= x < width and 0 <= y < height):
+            raise KeyError(coordinate)
+        coordinate = (int(x), int(y))
+        cell = self[coordinate] = self.grid.cell_klass(coordinate, self.grid.capacity, random=self.grid.random)
+        if self.grid.populate is not None:
+            self.grid.populate(cell)
+        return cell
+
+
+class LazyMooreGrid(OrthogonalMooreGrid):
+    """
+    OrthogonalMooreGrid (without torus) that only creates a cell, and connects
+    it to its neighbors, when it is first used. Building a large grid is then
+    instant, and a run only pays for the cells its robots reach.
+    Property layers are arrays of the whole grid, as in OrthogonalMooreGrid.
+    """
+
+    def __init__(self, dimensions, capacity=None, random=None, populate=None):
+        """
+        Args:
+            dimensions: [width, height] of the grid
+            capacity: Capacity of the cells
+            random: Random generator of the cells
+            populate: Called with every new cell, to place the agents that
+                start on it
+        """
+        # Skip Grid.__init__, which creates and connects every cell
+        super(Grid, self).__init__(capacity=capacity, random=random, cell_klass=LazyCell)
+        self.torus = False
+        self.dimensions = dimensions
+        self._try_random = True
+        self._ndims = len(dimensions)
+        self._validate_parameters()
+        self.cell_klass = type("GridCell", (LazyCell,), {"_mesa_properties": set(), "grid": self})
+        self.populate = populate
+        self._cells = _Cells(self)
+        self.create_property_layer("empty", default_value=True, dtype=bool)
+
+    def _connect_cells(self):
+        """Cells connect themselves when first used."""
+
+    def create_all(self):
+        """Create every cell not used yet (slow on large grids)."""
+        width, height = self.dimensions
+        for x in range(width):
+            for y in range(height):
+                self._cells[x, y]
+
+    @property
+    def all_cells(self):
+        """Every cell of the grid, creating the ones not used yet."""
+        self.create_all()
+        return CellCollection({cell: cell._agents for cell in self._cells.values()}, random=self.random)
+
+    def __iter__(self):
+        self.create_all()
+        return iter(self._cells.values())
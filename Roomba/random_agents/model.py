@@ -1,9 +1,17 @@
 import math
-import random
+import os
+import sys
 import mesa
+import numpy as np
 from mesa.discrete_space import OrthogonalMooreGrid
 
 from .agent import RandomAgent, ObstacleAgent, TrashAgent, RechargeStationAgent
+from .hierarchy import HierarchicalPlanner
+from .lazygrid import LazyMooreGrid
+from .planning import bfs_path, dilate, moore_graph, nearest_trash_paths
+from .replay import ReplayWriter
+from .stations import StationManager
+from .synchronous import CLEAN, DIE, MOVE, PRIORITIES, synchronous_tick
 
 class RandomModel(mesa.Model):
     """
@@ -11,19 +19,49 @@ class RandomModel(mesa.Model):
     Args:
         num_agents: Number of agents in the simulation
         height, width: The size of the grid to model
+        fast_forward: Skip ticks where every live robot is only recharging
+        batched_planning: Search trash for all robots at once at the start of each tick
+        cluster_size: Plan trips to recharge stations hierarchically, over square
+            clusters of this many cells per side (flat search when None)
+        floorplan: Floorplan (see load_floorplan) to use instead of a random layout;
+            it sets the size of the grid, and the robots start on its stations.
+            Its cells are only created once used (see LazyMooreGrid)
+        replay_log: File to write a replay log of the run to (see ReplayReader)
+        keyframe_interval: Ticks between the full states stored in the replay log
+        synchronous: Step all robots at once from the same snapshot, as array
+            updates (see synchronous_tick), instead of one by one in random order
+        priority: Robot that gets a cell several want in synchronous mode:
+            "battery" (lowest first) or "id" (see PRIORITIES)
     """
-    def __init__(self, num_agents=10, width=8, height=8, seed=42, percentage_dirty=20, percentage_obstacles=10, max_time=500):
+    def __init__(self, num_agents=10, width=8, height=8, seed=42, percentage_dirty=20, percentage_obstacles=10, max_time=500, fast_forward=False, batched_planning=False, cluster_size=None, floorplan=None, replay_log=None, keyframe_interval=100, synchronous=False, priority="battery"):
 
         super().__init__(seed=seed)
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        if floorplan is not None:
+            width, height = floorplan.width, floorplan.height
         self.num_agents = num_agents
         self.seed = seed
         self.width = width
         self.height = height 
         self.steps = 0
         self.max_time = max_time
+        self.fast_forward = fast_forward
+        self.batched_planning = batched_planning
+        self.cluster_size = cluster_size
+        self.floorplan = floorplan
+        self.synchronous = synchronous
+        self.priority = priority
+        self.trash_plans = {}  # Robot -> path to its nearest trash, for this tick
+        self.frontier_claims = {}  # Robot -> (x, y) frontier cell it is heading to
         self.running = True
 
-        self.grid = OrthogonalMooreGrid([width, height], capacity = math.inf, torus=False)
+        if floorplan is None:
+            self.grid = OrthogonalMooreGrid([width, height], capacity = math.inf, torus=False, random=self.random)
+        else:
+            # Cells, and the trash and stations on them, are only created once used
+            self.grid = LazyMooreGrid([width, height], capacity=math.inf, random=self.random,
+                                      populate=self.populate_cell)
 
         self.datacollector = mesa.DataCollector(
             {
@@ -33,7 +71,42 @@ class RandomModel(mesa.Model):
                 "Total Movements": lambda m: sum(a.steps_taken for a in m.agents if isinstance(a, RandomAgent))
             }
         )
-        
+
+        if floorplan is None:
+            recharge_positions = self.place_at_random(percentage_dirty, percentage_obstacles)
+        else:
+            recharge_positions = self.place_on_floorplan(floorplan, percentage_dirty)
+
+        # Initialize random agents at the recharge station positions
+        for i, cell in enumerate(recharge_positions):
+            RandomAgent(self, cell=cell)
+
+        self.build_layers()
+        self.planner = None
+        if cluster_size is not None:
+            # Robots in crisis don't go through trash, so it blocks the way until cleaned
+            self.planner = HierarchicalPlanner(
+                ~self.grid.obstacle.data & ~self.grid.trash.data,
+                landmarks=[(int(x), int(y)) for x, y in np.argwhere(self.grid.station.data)],
+                cluster_size=cluster_size,
+            )
+        self.stations = StationManager(self)
+        if synchronous:
+            # Only obstacles and dead robots block the way for good, so the graph
+            # is only built again when a robot dies
+            self.open_graph = moore_graph(~self.grid.obstacle.data)
+        self.replay = None
+        if replay_log is not None:
+            self.replay = ReplayWriter(replay_log, self, keyframe_interval)
+        self.datacollector.collect(self)
+
+    def place_at_random(self, percentage_dirty, percentage_obstacles):
+        """
+        Random layout: walls on the border, then obstacles, trash and recharge stations.
+        Returns: cells of the recharge stations, where the robots start
+        """
+        width, height = self.width, self.height
+
         # Identify the coordinates of the border of the grid
         border = [(x,y)
                   for y in range(height)
@@ -54,13 +127,13 @@ class RandomModel(mesa.Model):
 
         # Initialize random obstacles (excluding border cells)
         empty_cells = [cell for cell in self.grid.empties.cells if cell.coordinate not in border]
-        obstacle_cells = random.sample(empty_cells, min(num_obstacles, len(empty_cells)))
+        obstacle_cells = self.random.sample(empty_cells, min(num_obstacles, len(empty_cells)))
         for cell in obstacle_cells:
             ObstacleAgent(self, cell=cell)
 
         # Initialize random trash cells
         empty_cells = [cell for cell in self.grid.empties.cells]
-        trash_cells = random.sample(empty_cells, min(num_trash, len(empty_cells)))
+        trash_cells = self.random.sample(empty_cells, min(num_trash, len(empty_cells)))
         for cell in trash_cells:
             TrashAgent(self, cell=cell)
 
@@ -78,47 +151,384 @@ class RandomModel(mesa.Model):
         else:
             # For multiple agents, random positions
             empty_cells = [cell for cell in self.grid.empties.cells]
-            recharge_positions = random.sample(empty_cells, min(self.num_agents, len(empty_cells)))
+            recharge_positions = self.random.sample(empty_cells, min(self.num_agents, len(empty_cells)))
             for cell in recharge_positions:
                 RechargeStationAgent(self, cell=cell)
 
-        # Initialize random agents at the recharge station positions
-        for i, cell in enumerate(recharge_positions):
-            RandomAgent(self, cell=cell)
+        return recharge_positions
 
-        self.datacollector.collect(self)
+    def place_on_floorplan(self, floorplan, percentage_dirty):
+        """
+        Obstacle, trash and recharge station layers of a loaded floorplan, built
+        from its arrays. Walls get no agents, and trash and stations only get
+        theirs when their cell is first used (see populate_cell), so startup
+        doesn't grow with the size of the floor. Trash and stations the
+        floorplan doesn't have are placed at random on free cells.
+        Returns: cells of the recharge stations, where the robots start
+        """
+        obstacle = np.asarray(floorplan.obstacle)
+        free = floorplan.free_cells()
+
+        # Drawn from the model's generator, so the layout only depends on the seed
+        if floorplan.trash is None:
+            num_trash = int(len(free) * (percentage_dirty / 100))
+            chosen = free[self.rng.choice(len(free), min(num_trash, len(free)), replace=False)]
+            trash = np.zeros(obstacle.shape, dtype=bool)
+            trash[chosen[:, 0], chosen[:, 1]] = True
+        else:
+            trash = np.asarray(floorplan.trash) & ~obstacle
+
+        if floorplan.station is None:
+            empty = free[~trash[free[:, 0], free[:, 1]]]
+            stations = empty[self.rng.choice(len(empty), min(self.num_agents, len(empty)), replace=False)]
+        else:
+            stations = np.argwhere(np.asarray(floorplan.station) & ~obstacle)
+            self.num_agents = len(stations)
+
+        for name, data in [("obstacle", obstacle), ("trash", trash), ("station", np.zeros_like(trash))]:
+            self.grid.create_property_layer(name, False, bool).data[:] = data
+        self.grid.station.data[stations[:, 0], stations[:, 1]] = True
+        self.grid.empty.data[:] = ~(self.grid.trash.data | self.grid.station.data)
+        return [self.grid[x, y] for x, y in stations.tolist()]
+
+    def populate_cell(self, cell):
+        """
+        Place the trash and recharge station of a floorplan cell, from the
+        layers, when the grid creates the cell.
+        """
+        if self.grid.trash.data[cell.coordinate]:
+            TrashAgent(self, cell=cell)
+        if self.grid.station.data[cell.coordinate]:
+            RechargeStationAgent(self, cell=cell)
 
     def step(self):
         '''Advance the model by one step.'''
+        if self.fast_forward:
+            ticks = self.quiescent_ticks()
+            if ticks > 1:
+                self.skip_recharging(ticks)
+                return
+
         self.steps += 1
-        self.agents.shuffle_do("step")
+        if self.synchronous:
+            self.step_synchronous()
+        else:
+            if self.batched_planning:
+                self.plan_trash_paths()
+            self.agents.shuffle_do("step")
         
         # Check if we should stop
         if self.steps >= self.max_time or self.all_clean():
             self.running = False
             
         self.datacollector.collect(self)
+        self.record_replay(1)
+
+    def step_synchronous(self):
+        """
+        Step every live robot at once with synchronous_tick, then copy the
+        results back to the agents and the grid.
+        """
+        robots = [a for a in self.agents if isinstance(a, RandomAgent)]
+        arrays = {
+            "position": np.array([a.cell.coordinate for a in robots]).reshape(-1, 2),
+            "battery": np.array([a._battery for a in robots]),
+            "in_crisis": np.array([a.in_crisis for a in robots], dtype=bool),
+            "dead": np.array([a.dead for a in robots], dtype=bool),
+            "cleaned_trash": np.array([a.cleaned_trash for a in robots]),
+            "recharges": np.array([a.recharges for a in robots]),
+            "steps_taken": np.array([a.steps_taken for a in robots]),
+        }
+        layers = {
+            "obstacle": self.grid.obstacle.data,
+            "station": self.grid.station.data,
+            "trash": self.grid.trash.data.copy(),
+            "last_visit": self.grid.last_visit.data,
+        }
+        stations = self.stations
+
+        def at_station(indices):
+            # Same rule as RandomAgent.step and recharge: only queue heads charge
+            stays = np.zeros(len(indices), dtype=bool)
+            charges = np.zeros(len(indices), dtype=bool)
+            for k, i in enumerate(indices):
+                robot = robots[i]
+                if robot.in_crisis or not stations.reserved_by_others(robot):
+                    stays[k] = True
+                    charges[k] = robot._battery < 100 and stations.charging(robot)
+            return stays, charges
+
+        def station_steps(indices):
+            # Like crisis: the last step, onto the station, joins its queue
+            steps = np.full((len(indices), 2), -1)
+            arrives = np.zeros(len(indices), dtype=bool)
+            for k, i in enumerate(indices):
+                robot = robots[i]
+                if not robot.path_to_station:
+                    robot.path_to_station = stations.assign(robot)
+                if robot.path_to_station:
+                    steps[k] = robot.path_to_station[0].coordinate
+                    arrives[k] = len(robot.path_to_station) == 1
+            return steps, arrives
+
+        action, crisis = synchronous_tick(
+            arrays, layers, *self.open_graph, self.rng, at_station, station_steps, self.priority)
+
+        for i in np.flatnonzero(action == CLEAN):
+            trash = [a for a in robots[i].cell.agents if isinstance(a, TrashAgent)]
+            trash[0].disappear()
+        for i in np.flatnonzero(crisis):
+            robot = robots[i]
+            if action[i] == MOVE:
+                robot.path_to_station.pop(0)
+            elif any(a.in_crisis for a in robot.path_to_station[0].agents if isinstance(a, RandomAgent)):
+                # The robot in the way is charging or queuing: plan again around it
+                robot.path_to_station = []
+        for i, robot in enumerate(robots):
+            if action[i] == MOVE:
+                robot.cell = self.grid[tuple(int(v) for v in arrays["position"][i])]
+            robot._battery = int(arrays["battery"][i])
+            robot.in_crisis = bool(arrays["in_crisis"][i])
+            robot.dead = bool(arrays["dead"][i])
+            robot.cleaned_trash = int(arrays["cleaned_trash"][i])
+            robot.recharges = int(arrays["recharges"][i])
+            robot.steps_taken = int(arrays["steps_taken"][i])
+            if robot.dead or (robot._battery >= 100 and robot.cell.coordinate in stations.queues):
+                # Full robots leave their station, and dead ones give it up
+                robot.path_to_station = []
+                stations.release(robot)
+
+        live = ~arrays["dead"]
+        position = arrays["position"]
+        self.grid.last_visit.data[position[live, 0], position[live, 1]] = self.steps
+        if (action == DIE).any():
+            blocked = self.grid.obstacle.data.copy()
+            blocked[position[~live, 0], position[~live, 1]] = True
+            self.open_graph = moore_graph(~blocked)
+            if not live.any():
+                self.running = False
+
+    def record_replay(self, ticks):
+        """Append the last tick (or the ticks fast-forwarded) to the replay log, closing it at the end."""
+        if self.replay is None or self.replay.closed:
+            return
+        if ticks > 1:
+            self.replay.record_skip(ticks)
+        else:
+            self.replay.record()
+        if not self.running:
+            self.replay.close()
     
+    def close(self):
+        """Flush and close the replay log, for runs stopped before the model stops itself."""
+        if self.replay is not None:
+            self.replay.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def build_layers(self):
+        """
+        Array layers of the grid (indexed [x, y]) with obstacles, recharge stations and trash.
+        The trash layer is kept up to date when trash is cleaned.
+        The last_visit layer is the coverage map shared by all robots: the step
+        in which a robot was last on each cell, or -1 if no robot has been there.
+        """
+        # Floorplans build theirs from arrays (see place_on_floorplan)
+        if self.floorplan is None:
+            for name in ["obstacle", "station", "trash"]:
+                self.grid.create_property_layer(name, False, bool)
+        self.grid.create_property_layer("last_visit", -1, int)
+
+        for agent in self.agents:
+            if isinstance(agent, RandomAgent):
+                self.grid.last_visit.data[agent.cell.coordinate] = self.steps
+            elif isinstance(agent, ObstacleAgent):
+                self.grid.obstacle.data[agent.cell.coordinate] = True
+            elif isinstance(agent, RechargeStationAgent):
+                self.grid.station.data[agent.cell.coordinate] = True
+            elif isinstance(agent, TrashAgent):
+                self.grid.trash.data[agent.cell.coordinate] = True
+
+    def plan_trash_paths(self, max_distance=5):
+        """
+        Find the nearest trash of every exploring robot in a single batched search.
+        Robots without a path to trash pick their plan up in find_nearest_trash.
+        Args:
+            max_distance: Farthest trash to look for, in steps
+        """
+        robots = [a for a in self.agents if isinstance(a, RandomAgent)]
+        searching = [a for a in robots if not a.dead and not a.path_to_trash]
+        self.trash_plans = {}
+        if not searching:
+            return
+
+        # Same rule as the agent's BFS: empty cells, trash or recharge stations
+        occupied = np.zeros((self.width, self.height), dtype=bool)
+        for agent in robots:
+            occupied[agent.cell.coordinate] = True
+        trash = self.grid.trash.data
+        passable = ~self.grid.obstacle.data & (~occupied | trash | self.grid.station.data)
+
+        positions = np.array([agent.cell.coordinate for agent in searching])
+        paths = nearest_trash_paths(passable, trash, positions, max_distance)
+        for agent, path in zip(searching, paths):
+            self.trash_plans[agent] = None if path is None else [self.grid[x, y] for x, y in path]
+
+    def frontier_path(self, robot, sense_radius=2):
+        """
+        Path from a robot to the nearest frontier cluster no other robot has claimed.
+        A cell counts as explored once a robot has been within sense_radius of it.
+        The frontier are the unexplored open cells next to explored ones, split in
+        clusters of touching cells, so robots spread over different unexplored areas.
+        Args:
+            robot: RandomAgent looking for somewhere to explore
+            sense_radius: Cells around each visited cell that count as explored
+        Returns: list of cells to the frontier, or None once everything was explored
+        """
+        explored = self.grid.last_visit.data >= 0
+        for _ in range(sense_radius):
+            explored = dilate(explored)
+        open_cells = ~self.grid.obstacle.data
+        frontier = open_cells & ~explored & dilate(explored)
+        self.frontier_claims.pop(robot, None)
+        if not frontier.any():
+            return None
+
+        # Imported here, as it adds about 50 ms to the startup of every process
+        from scipy import ndimage
+
+        clusters, _ = ndimage.label(frontier, structure=np.ones((3, 3), dtype=bool))
+        # Robots in crisis or dead stopped exploring their frontier
+        claimed = {
+            clusters[target] for other, target in self.frontier_claims.items()
+            if not other.dead and not other.in_crisis
+        }
+        claimed.discard(0)  # The claimed cell was already explored
+        unclaimed = frontier & ~np.isin(clusters, list(claimed))
+
+        # Other robots keep moving, so only obstacles block the way
+        start = robot.cell.coordinate
+        path = bfs_path(open_cells, start, unclaimed) if unclaimed.any() else None
+        if path is None:
+            path = bfs_path(open_cells, start, frontier)
+        if not path:
+            return None
+
+        self.frontier_claims[robot] = path[-1]
+        return [self.grid[x, y] for x, y in path]
+
+    def quiescent_ticks(self):
+        """
+        Number of upcoming ticks in which no robot takes a decision.
+        That happens when every live robot is alone on a recharge station
+        and charging, so each tick only adds 5% to its battery.
+        Returns: 0 if some robot has to act in the next tick
+        """
+        robots = [a for a in self.agents if isinstance(a, RandomAgent) and not a.dead]
+        if not robots:
+            return 0
+
+        ticks = math.inf
+        for agent in robots:
+            if not 0 < agent._battery < 100:
+                return 0
+            if any(isinstance(a, TrashAgent) for a in agent.cell.agents):
+                return 0
+            if not any(isinstance(a, RechargeStationAgent) for a in agent.cell.agents):
+                return 0
+            if any(isinstance(a, RandomAgent) and a != agent for a in agent.cell.agents):
+                return 0
+            if not agent.in_crisis and self.stations.reserved_by_others(agent):
+                return 0
+            # Ticks until this robot is full and leaves the station
+            ticks = min(ticks, math.ceil((100 - agent._battery) / 5))
+
+        # Never jump past the tick where max_time stops the run
+        # (mesa already added 1 to self.steps before calling step)
+        previous_steps = self.steps - 1
+        if previous_steps < self.max_time:
+            ticks = min(ticks, math.ceil((self.max_time - previous_steps) / 2))
+        else:
+            ticks = 1
+        return ticks
+
+    def skip_recharging(self, ticks):
+        """
+        Advance the clock over a quiescent interval found by quiescent_ticks.
+        Batteries and metric samples are computed directly, and the random
+        generator is advanced as shuffle_do would, so the run is identical
+        to stepping tick by tick.
+        Args:
+            ticks: Number of ticks to skip
+        """
+        robots = [a for a in self.agents if isinstance(a, RandomAgent)]
+        live = [a for a in robots if not a.dead]
+        battery_sum = sum(a._battery for a in robots)
+        previous_steps = self.steps - 1
+
+        # Metrics that don't change while robots only recharge
+        percentage_clean = self.percentage_clean()
+        total_movements = sum(a.steps_taken for a in robots)
+
+        # Every tick shuffles the whole agent set once (synchronous ticks don't
+        # draw numbers while robots only recharge)
+        if not self.synchronous:
+            order = list(range(len(self.agents)))
+            for _ in range(ticks):
+                self.random.shuffle(order)
+
+        for agent in live:
+            self.stations.charging(agent)
+            agent._battery = min(100, agent._battery + 5 * ticks)
+            agent.recharges += ticks
+            if agent._battery >= 100:
+                agent.in_crisis = False
+                agent.path_to_station = []
+                agent.path_to_trash = []
+                self.stations.release(agent)
+
+        # No robot gets full before the last tick, so the battery sum grows linearly
+        final_sum = sum(a._battery for a in robots)
+        for tick in range(1, ticks + 1):
+            if tick < ticks:
+                total_battery = battery_sum + 5 * tick * len(live)
+            else:
+                total_battery = final_sum
+            samples = {
+                "Battery": total_battery / len(robots),
+                "Percentage Clean": percentage_clean,
+                "Time": self.max_time - (previous_steps + 2 * tick),
+                "Total Movements": total_movements,
+            }
+            for name, value in samples.items():
+                self.datacollector.model_vars[name].append(value)
+
+        self.steps = previous_steps + 2 * ticks
+        for agent in live:
+            self.grid.last_visit.data[agent.cell.coordinate] = self.steps
+        if self.steps >= self.max_time or self.all_clean():
+            self.running = False
+        self.record_replay(ticks)
+
     def count_clean_cells(self):
         """Count cells that don't have trash."""
-        trash_cells = len([a for a in self.agents if isinstance(a, TrashAgent)])
-        total_cells = self.grid.width * self.grid.height
-        all_obstacles = len([a for a in self.agents if isinstance(a, ObstacleAgent)])
-        cleanable_cells = total_cells - all_obstacles  
+        trash_cells = np.count_nonzero(self.grid.trash.data)
+        cleanable_cells = self.width * self.height - np.count_nonzero(self.grid.obstacle.data)
         clean_cells = cleanable_cells - trash_cells
         return clean_cells
     
     def percentage_clean(self):
         """Calculate the percentage of clean cells."""
-        total_cells = self.grid.width * self.grid.height
-        border_cells = 2 * (self.width + self.height) - 4
-        obstacle_cells = len([a for a in self.agents if isinstance(a, ObstacleAgent)]) - border_cells
-        cleanable_cells = total_cells - border_cells - obstacle_cells
+        # Walls of a floorplan are only in the obstacle layer, not agents
+        cleanable_cells = self.width * self.height - np.count_nonzero(self.grid.obstacle.data)
         
         if cleanable_cells == 0:
             return 100
 
-            
         clean_cells = self.count_clean_cells()
         clean_percentage = (clean_cells / cleanable_cells) * 100
         #print( f"Clean Cells: {clean_cells}, Cleanable Cells: {cleanable_cells}, Percentage Clean: {clean_percentage}%")
@@ -126,8 +536,19 @@ class RandomModel(mesa.Model):
     
     def all_clean(self):
         """Check if all cells are clean."""
-        return len([a for a in self.agents if isinstance(a, TrashAgent)]) == 0
+        return not self.grid.trash.data.any()
     
+    def memory_report(self):
+        """
+        Bytes allocated for each agent type (see agent_memory, shared with the
+        cellular automata project); needs tracemalloc tracing.
+        """
+        automata = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "Automata_Celular"))
+        if automata not in sys.path:
+            sys.path.append(automata)
+        from game_of_life.memory import agent_memory
+        return agent_memory(self.agents)
+
     def average_battery(self):
         """Calculate the average battery level of all agents."""
         batteries = [a._battery for a in self.agents if isinstance(a, RandomAgent)]
@@ -0,0 +1,209 @@
+from collections import deque
+
+import numpy as np
+
+# Moore neighborhood offsets, in the order paths are traced back
+OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def dilate(mask):
+    """Cells of the last two axes that touch a True cell (Moore neighborhood)."""
+    grown = mask.copy()
+    for dx, dy in OFFSETS:
+        src_x = slice(max(0, -dx), mask.shape[-2] - max(0, dx))
+        dst_x = slice(max(0, dx), mask.shape[-2] - max(0, -dx))
+        src_y = slice(max(0, -dy), mask.shape[-1] - max(0, dy))
+        dst_y = slice(max(0, dy), mask.shape[-1] - max(0, -dy))
+        grown[..., dst_x, dst_y] |= mask[..., src_x, src_y]
+    return grown
+
+
+def moore_graph(passable):
+    """Sparse graph of the passable cells of a [x, y] layer, linked by Moore moves.
+
+    Returns:
+        (adjacency matrix, [x, y] array with the node id of every passable
+        cell, -1 for the others); ids follow np.argwhere(passable)
+    """
+    # Only the planners that search graphs need scipy, not importing the model
+    from scipy.sparse import csr_matrix
+
+    width, height = passable.shape
+    ids = np.full(passable.shape, -1)
+    ids[passable] = np.arange(np.count_nonzero(passable))
+    sources, targets = [], []
+    for dx, dy in OFFSETS:
+        src = ids[max(0, -dx):width - max(0, dx), max(0, -dy):height - max(0, dy)]
+        dst = ids[max(0, dx):width - max(0, -dx), max(0, dy):height - max(0, -dy)]
+        keep = (src >= 0) & (dst >= 0)
+        sources.append(src[keep])
+        targets.append(dst[keep])
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    size = np.count_nonzero(passable)
+    graph = csr_matrix((np.ones(len(sources)), (sources, targets)), shape=(size, size))
+    return graph, ids
+
+
+def distance_field(graph, ids, sources):
+    """Steps from every cell of a moore_graph to the nearest source cell, -1 if unreachable.
+
+    Args:
+        graph, ids: Result of moore_graph
+        sources: [x, y] bool layer of the cells to measure the distance to
+    Returns:
+        [x, y] int32 array
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import shortest_path
+
+    field = np.full(ids.shape, -1, dtype=np.int32)
+    size = graph.shape[0]
+    targets = ids[sources & (ids >= 0)]
+    if not size or not len(targets):
+        return field
+    # One extra node next to every source, so a single search reaches them all
+    graph = graph.tocoo()
+    rows = np.concatenate([graph.row, np.full(len(targets), size)])
+    cols = np.concatenate([graph.col, targets])
+    graph = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(size + 1, size + 1))
+    distance = shortest_path(graph, method="D", unweighted=True, indices=size)[:size] - 1
+
+    field[ids >= 0] = np.where(np.isfinite(distance), distance, -1)
+    return field
+
+
+def windows(layer, positions, radius, fill=False):
+    """(R, 2 * radius + 1, 2 * radius + 1) windows of a [x, y] layer centered on positions."""
+    padded = np.pad(layer, radius, constant_values=fill)
+    size = 2 * radius + 1
+    view = np.lib.stride_tricks.sliding_window_view(padded, (size, size))
+    return view[positions[:, 0], positions[:, 1]].copy()
+
+
+def nearest_trash_paths(passable, trash, positions, max_distance=5):
+    """Paths from every robot to its nearest trash, found in one labeled wavefront.
+
+    All the robots expand their breadth-first frontiers together, each one in
+    its own (2 * max_distance + 1)^2 window: with Moore moves a robot cannot
+    leave that window in max_distance steps.
+
+    Args:
+        passable: [x, y] bool layer of the cells robots can move through
+        trash: [x, y] bool layer of the cells with trash
+        positions: (R, 2) array with the (x, y) position of each robot
+        max_distance: Farthest trash to look for, in steps
+    Returns:
+        One list of (x, y) coordinates per robot, from its first step to the
+        trash (excluding its own cell), or None if there is no trash in reach
+    """
+    positions = np.asarray(positions, dtype=int).reshape(-1, 2)
+    robots = len(positions)
+    radius = max_distance
+    open_cells = windows(passable, positions, radius)
+    trash_cells = windows(trash, positions, radius)
+
+    # distance[r, i, j] = steps from robot r to window cell (i, j), -1 if not reached
+    distance = np.full(open_cells.shape, -1, dtype=np.int16)
+    distance[:, radius, radius] = 0
+    reached = distance == 0
+    frontier = reached.copy()
+    # A robot standing on trash gets an empty path, like the agent's BFS
+    searching = ~trash_cells[:, radius, radius]
+    targets = [None if searching[r] else (radius, radius) for r in range(robots)]
+
+    for step in range(1, max_distance + 1):
+        frontier = dilate(frontier) & open_cells & ~reached
+        frontier[~searching] = False
+        if not frontier.any():
+            break
+        reached |= frontier
+        distance[frontier] = step
+
+        hits = frontier & trash_cells
+        for r in np.flatnonzero(hits.any(axis=(1, 2)) & searching):
+            i, j = np.argwhere(hits[r])[0]
+            targets[r] = (i, j)
+            searching[r] = False
+        if not searching.any():
+            break
+
+    paths = []
+    for r, target in enumerate(targets):
+        if target is None:
+            paths.append(None)
+            continue
+        # Walk back from the trash through cells one step closer to the robot
+        i, j = target
+        path = []
+        while distance[r, i, j] > 0:
+            path.append((int(positions[r, 0] + i - radius), int(positions[r, 1] + j - radius)))
+            for dx, dy in OFFSETS:
+                ni, nj = i + dx, j + dy
+                if (0 <= ni < distance.shape[1] and 0 <= nj < distance.shape[2]
+                        and distance[r, ni, nj] == distance[r, i, j] - 1):
+                    i, j = ni, nj
+                    break
+        path.reverse()
+        paths.append(path)
+    return paths
+
+
+def bfs_search(passable, start, goals, stop):
+    """Breadth-first search (Moore moves over passable cells) that reports goals by distance.
+
+    Goal cells can always be entered, but the search only goes on through passable ones.
+
+    Args:
+        passable: [x, y] bool layer of the cells robots can move through
+        start: (x, y) coordinate of the robot
+        goals: [x, y] bool layer of the goal cells
+        stop: Called with (coordinate, distance) for every goal reached, in
+            order of distance; the search ends when it returns True
+    Returns:
+        Dictionary from every reached coordinate to the one it was reached from
+        (see trace_path)
+    """
+    width, height = passable.shape
+    previous = {start: None}
+    queue = deque([(start, 0)])
+    while queue:
+        current, distance = queue.popleft()
+        if goals[current] and stop(current, distance):
+            break
+        if current != start and not passable[current]:
+            continue
+
+        x, y = current
+        for dx, dy in OFFSETS:
+            neighbor = (x + dx, y + dy)
+            if (0 <= neighbor[0] < width and 0 <= neighbor[1] < height
+                    and neighbor not in previous and (passable[neighbor] or goals[neighbor])):
+                previous[neighbor] = current
+                queue.append((neighbor, distance + 1))
+    return previous
+
+
+def trace_path(previous, goal):
+    """Coordinates from the first step after the start to goal, following a bfs_search tree."""
+    path = []
+    while previous[goal] is not None:
+        path.append(goal)
+        goal = previous[goal]
+    path.reverse()
+    return path
+
+
+def bfs_path(passable, start, goals):
+    """Shortest path (Moore moves over passable cells) from start to the nearest goal cell.
+
+    Args:
+        passable: [x, y] bool layer of the cells robots can move through
+        start: (x, y) coordinate of the robot
+        goals: [x, y] bool layer of the goal cells
+    Returns:
+        List of (x, y) coordinates from the first step to the goal, [] if the
+        start is a goal, or None if no goal can be reached
+    """
+    found = []
+    previous = bfs_search(passable, start, goals, lambda goal, distance: found.append(goal) or True)
+    return trace_path(previous, found[0]) if found else None
@@ -0,0 +1,291 @@
+import bisect
+import struct
+
+import numpy as np
+
+from .agent import RandomAgent
+
+MAGIC = b"RMBR"
+VERSION = 1
+
+# Header: magic, version, width, height, robots, keyframe interval
+HEADER = struct.Struct("<4sHIIII")
+# Every record starts with its kind, the tick it ends on and its payload size
+RECORD = struct.Struct("<BII")
+# Event counts of a tick: moves, cleans, recharges, deaths, battery corrections
+COUNTS = struct.Struct("<IIIII")
+
+KEYFRAME = 1  # Full state of the robots and the trash layer
+TICK = 2  # Events of one tick
+SKIP = 3  # Ticks in which every live robot only recharged (fast forward)
+
+
+class ReplayState:
+    """
+    State of a run at one tick, as rebuilt from a replay log.
+    Attributes:
+        tick: Number of ticks run
+        position: (R, 2) array with the (x, y) of every robot
+        battery: (R,) array with the battery of every robot
+        dead: (R,) bool array
+        trash: [x, y] bool layer of the trash left
+    """
+
+    def __init__(self, tick, position, battery, dead, trash):
+        self.tick = tick
+        self.position = position
+        self.battery = battery
+        self.dead = dead
+        self.trash = trash
+
+    def copy(self):
+        return ReplayState(self.tick, self.position.copy(), self.battery.copy(), self.dead.copy(), self.trash.copy())
+
+
+def _pack(layer):
+    return np.packbits(np.asarray(layer, dtype=bool)).tobytes()
+
+
+def _unpack(data, shape):
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=shape[0] * shape[1])
+    return bits.astype(bool).reshape(shape)
+
+
+class ReplayWriter:
+    """
+    Append-only binary log of the robots of a RandomModel.
+    Each tick is stored as columns of events (moves as (dx, dy) deltas, cleans,
+    recharges, deaths, and the battery changes those don't explain, like
+    waiting), found by comparing the robots with the previous tick. A keyframe
+    with the full state is written every keyframe_interval ticks, so a reader
+    can start from any of them.
+    """
+
+    def __init__(self, path, model, keyframe_interval=100):
+        """
+        Args:
+            path: File to write (it is overwritten)
+            model: RandomModel whose layers are already built
+            keyframe_interval: Ticks between keyframes
+        """
+        self.model = model
+        self.keyframe_interval = keyframe_interval
+        self.robots = [a for a in model.agents if isinstance(a, RandomAgent)]
+        self.tick = 0
+        self.file = open(path, "wb")
+
+        grid = model.grid
+        self.file.write(HEADER.pack(MAGIC, VERSION, model.width, model.height, len(self.robots), keyframe_interval))
+        self.file.write(_pack(grid.obstacle.data))
+        self.file.write(_pack(grid.station.data))
+        self.file.write(np.array([a.unique_id for a in self.robots], dtype="<u4").tobytes())
+        self.last = self.snapshot()
+        self.write_keyframe()
+
+    def snapshot(self):
+        """Columns with what the events of a tick are worked out from."""
+        return {
+            "position": np.array([a.cell.coordinate for a in self.robots], dtype="<u2").reshape(-1, 2),
+            "battery": np.array([a._battery for a in self.robots], dtype="<i2"),
+            "dead": np.array([a.dead for a in self.robots], dtype=bool),
+            "cleaned": np.array([a.cleaned_trash for a in self.robots]),
+            "recharges": np.array([a.recharges for a in self.robots]),
+        }
+
+    def write_record(self, kind, payload):
+        self.file.write(RECORD.pack(kind, self.tick, len(payload)))
+        self.file.write(payload)
+        # A run stopped at any point leaves whole records
+        self.file.flush()
+
+    def write_keyframe(self):
+        state = self.last
+        self.write_record(KEYFRAME, b"".join([
+            state["position"].tobytes(),
+            state["battery"].tobytes(),
+            _pack(state["dead"]),
+            _pack(self.model.grid.trash.data),
+        ]))
+
+    def record(self):
+        """Append the events of the tick the model just ran."""
+        current = self.snapshot()
+        last = self.last
+        moved = np.flatnonzero((current["position"] != last["position"]).any(axis=1))
+        cleaned = np.flatnonzero(current["cleaned"] != last["cleaned"])
+        recharged = np.flatnonzero(current["recharges"] != last["recharges"])
+        died = np.flatnonzero(current["dead"] & ~last["dead"])
+
+        # Battery the events account for, corrected with explicit changes
+        battery = _apply_battery(last["battery"], moved, cleaned, recharged, died)
+        corrected = np.flatnonzero(battery != current["battery"])
+
+        deltas = current["position"][moved].astype(np.int16) - last["position"][moved]
+        self.tick += 1
+        self.write_record(TICK, b"".join([
+            COUNTS.pack(len(moved), len(cleaned), len(recharged), len(died), len(corrected)),
+            moved.astype("<u4").tobytes(),
+            deltas.astype(np.int8).tobytes(),
+            cleaned.astype("<u4").tobytes(),
+            recharged.astype("<u4").tobytes(),
+            died.astype("<u4").tobytes(),
+            corrected.astype("<u4").tobytes(),
+            (current["battery"][corrected] - battery[corrected]).astype("<i2").tobytes(),
+        ]))
+        self.last = current
+        if self.tick % self.keyframe_interval == 0:
+            self.write_keyframe()
+
+    def record_skip(self, ticks):
+        """Append an interval skipped by the model's fast forward (see skip_recharging)."""
+        previous = self.tick
+        self.tick += ticks
+        self.write_record(SKIP, struct.pack("<I", ticks))
+        self.last = self.snapshot()
+        if self.tick // self.keyframe_interval > previous // self.keyframe_interval:
+            self.write_keyframe()
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def close(self):
+        """Flush and close the file."""
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _apply_battery(battery, moved, cleaned, recharged, died):
+    """Battery after a tick: moves and cleans cost 1, recharges add 5, dead robots have 0."""
+    battery = battery.copy()
+    battery[moved] -= 1
+    battery[cleaned] -= 1
+    battery[recharged] = np.minimum(100, battery[recharged] + 5)
+    battery[died] = 0
+    return battery
+
+
+class ReplayReader:
+    """
+    Reads a log written by ReplayWriter without running the model.
+    Opening it only reads the record headers, and state() rebuilds any tick
+    from the last keyframe before it.
+    Attributes:
+        width, height: Size of the grid
+        unique_ids: Robot unique_id of every robot index
+        obstacle, station: [x, y] bool layers
+        ticks: Number of ticks in the log
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        magic, version, self.width, self.height, robots, self.keyframe_interval = HEADER.unpack(
+            self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} Roomba replay log")
+        shape = (self.width, self.height)
+        layer_bytes = (self.width * self.height + 7) // 8
+        self.obstacle = _unpack(self.file.read(layer_bytes), shape)
+        self.station = _unpack(self.file.read(layer_bytes), shape)
+        self.unique_ids = np.frombuffer(self.file.read(4 * robots), dtype="<u4")
+        self.robots = robots
+
+        # (kind, tick, offset, size) of every record; a partly written last one is ignored
+        self.records = []
+        end = self.file.seek(0, 2)
+        offset = self.file.seek(HEADER.size + 2 * layer_bytes + 4 * robots)
+        while offset + RECORD.size <= end:
+            kind, tick, size = RECORD.unpack(self.file.read(RECORD.size))
+            if offset + RECORD.size + size > end:
+                break
+            self.records.append((kind, tick, offset + RECORD.size, size))
+            offset = self.file.seek(size, 1)
+        self.ends = [tick for _, tick, _, _ in self.records]
+        self.keyframes = [i for i, record in enumerate(self.records) if record[0] == KEYFRAME]
+        self.keyframe_ticks = [self.ends[i] for i in self.keyframes]
+        self.ticks = self.records[-1][1] if self.records else 0
+
+    def read(self, index):
+        kind, tick, offset, size = self.records[index]
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    def keyframe(self, index):
+        data = self.read(index)
+        robots = self.robots
+        position = np.frombuffer(data, dtype="<u2", count=2 * robots).reshape(-1, 2).astype(int)
+        battery = np.frombuffer(data, dtype="<i2", count=robots, offset=4 * robots).astype(int)
+        dead_bytes = (robots + 7) // 8
+        dead = _unpack(data[6 * robots:6 * robots + dead_bytes], (robots, 1))[:, 0]
+        trash = _unpack(data[6 * robots + dead_bytes:], (self.width, self.height))
+        return ReplayState(self.records[index][1], position, battery, dead, trash)
+
+    def advance(self, state, tick):
+        """
+        Advance a state to a later tick, applying the records in between.
+        Ticks inside a fast-forwarded interval are computed from its recharges.
+        """
+        index = bisect.bisect_right(self.ends, state.tick)
+        for kind, end, _, _ in self.records[index:]:
+            if end > tick and kind != SKIP:
+                break
+            data = self.read(index) if kind != KEYFRAME else None
+            index += 1
+            if kind == SKIP:
+                live = ~state.dead
+                ticks = min(end, tick) - state.tick
+                state.battery[live] = np.minimum(100, state.battery[live] + 5 * ticks)
+            elif kind == TICK:
+                self.apply_tick(state, data)
+            state.tick = min(end, tick)
+            if end >= tick:
+                break
+        return state
+
+    def apply_tick(self, state, data):
+        counts = COUNTS.unpack_from(data)
+        offset = COUNTS.size
+        moved = np.frombuffer(data, dtype="<u4", count=counts[0], offset=offset)
+        offset += 4 * counts[0]
+        deltas = np.frombuffer(data, dtype=np.int8, count=2 * counts[0], offset=offset).reshape(-1, 2)
+        offset += 2 * counts[0]
+        columns = []
+        for count in counts[1:]:
+            columns.append(np.frombuffer(data, dtype="<u4", count=count, offset=offset))
+            offset += 4 * count
+        cleaned, recharged, died, corrected = columns
+        corrections = np.frombuffer(data, dtype="<i2", count=counts[4], offset=offset)
+
+        # Robots clean the cell they are on at the start of the tick, or move
+        cells = state.position[cleaned]
+        state.trash[cells[:, 0], cells[:, 1]] = False
+        state.position[moved] += deltas
+        state.battery = _apply_battery(state.battery, moved, cleaned, recharged, died)
+        state.battery[corrected] += corrections
+        state.dead[died] = True
+
+    def state(self, tick):
+        """State of the run after a number of ticks (0 is the initial state)."""
+        if not 0 <= tick <= self.ticks:
+            raise IndexError(f"tick {tick} is not in the log (0 to {self.ticks})")
+        start = self.keyframes[bisect.bisect_right(self.keyframe_ticks, tick) - 1]
+        return self.advance(self.keyframe(start), tick)
+
+    def frames(self, start=0, stop=None):
+        """Yield the state of every tick from start to stop (excluded), reading the log once."""
+        stop = self.ticks + 1 if stop is None else min(stop, self.ticks + 1)
+        if start >= stop:
+            return
+        state = self.state(start)
+        yield state.copy()
+        for tick in range(start + 1, stop):
+            yield self.advance(state, tick).copy()
+
+    def close(self):
+        self.file.close()
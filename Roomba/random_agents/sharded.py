@@ -0,0 +1,409 @@
+import math
+import multiprocessing as mp
+import os
+import time
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .agent import RandomAgent
+from .planning import OFFSETS, distance_field, moore_graph
+from .synchronous import MOVE, PRIORITIES, TRASH_RADIUS, synchronous_tick
+
+# Columns beyond its strip a robot can read (trash search) or write (one move)
+REACH = TRASH_RADIUS + 1
+# Strips of the same color never touch each other's reach
+MIN_STRIP = 2 * REACH
+
+# Arrays in shared memory: name -> dtype (robot arrays are indexed by robot,
+# layers [x, y])
+ROBOT_FIELDS = {
+    "x": np.int32,
+    "y": np.int32,
+    "battery": np.int16,
+    "in_crisis": np.bool_,
+    "dead": np.bool_,
+    "cleaned_trash": np.int32,
+    "recharges": np.int32,
+    "steps_taken": np.int32,
+    "stepped": np.int32,  # Last tick the robot was stepped
+    "arrived": np.int32,  # Tick the robot got to its cell, the order of station queues
+}
+# Fields synchronous_tick updates
+TICK_FIELDS = ["battery", "in_crisis", "dead", "cleaned_trash", "recharges", "steps_taken"]
+LAYERS = {
+    "obstacle": np.bool_,
+    "station": np.bool_,
+    "trash": np.bool_,
+    "robots": np.int32,  # Number of robots on each cell, dead ones included
+    "last_visit": np.int32,
+    "station_distance": np.int32,  # Steps to the nearest station, -1 if unreachable
+}
+
+
+def _specs(width, height, robots):
+    """Shape and dtype of every shared array."""
+    specs = {name: ((robots,), dtype) for name, dtype in ROBOT_FIELDS.items()}
+    specs.update({name: ((width, height), dtype) for name, dtype in LAYERS.items()})
+    return specs
+
+
+def _views(memories, specs):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=memories[name].buf)
+        for name, (shape, dtype) in specs.items()
+    }
+
+
+def station_distances(obstacle, station):
+    """[x, y] steps from every cell to the nearest recharge station (Moore moves), -1 if unreachable."""
+    graph, ids = moore_graph(~obstacle)
+    return distance_field(graph, ids, station)
+
+
+def step_strip(arrays, x0, x1, tick, rng, priority="battery", graphs=None):
+    """Step with synchronous_tick the robots of the columns [x0, x1) not stepped yet this tick.
+
+    The tick only sees the columns [x0 - REACH, x1 + REACH), so strips of the
+    same color can be stepped at the same time. Robots of other strips in
+    them are boundary state: they stay put, and their cells are taken.
+
+    Args:
+        graphs: Dict to keep the moore_graph of the strip in between ticks; it
+            only changes when a robot dies within reach
+    """
+    x, y = arrays["x"], arrays["y"]
+    width = arrays["obstacle"].shape[0]
+    lo, hi = max(0, x0 - REACH), min(width, x1 + REACH)
+    nearby = np.flatnonzero((x >= lo) & (x < hi))
+    members = nearby[(x[nearby] < x1) & (x[nearby] >= x0) & (arrays["stepped"][nearby] != tick)
+                     & ~arrays["dead"][nearby]]
+    if not len(members):
+        return
+
+    window = slice(lo, hi)
+    layers = {name: arrays[name][window] for name in ("obstacle", "station", "trash", "last_visit")}
+    robots = {name: arrays[name][members] for name in TICK_FIELDS}
+    robots["position"] = np.stack([x[members] - lo, y[members]], axis=1)
+    others = arrays["robots"][window].copy()
+    np.subtract.at(others, (robots["position"][:, 0], robots["position"][:, 1]), 1)
+    taken = arrays["robots"][window] > 0
+
+    # Dead robots block the way, like in RandomModel.open_graph
+    dead = nearby[arrays["dead"][nearby]]
+    cached = graphs.get(x0) if graphs is not None else None
+    if cached is not None and np.array_equal(cached[0], dead):
+        graph, ids = cached[1:]
+    else:
+        blocked = layers["obstacle"].copy()
+        blocked[x[dead] - lo, y[dead]] = True
+        graph, ids = moore_graph(~blocked)
+        if graphs is not None:
+            graphs[x0] = (dead, graph, ids)
+
+    # Live robots on each station, in order of arrival, the first one charging
+    queues = {}
+    for robot in nearby[~arrays["dead"][nearby]]:
+        cell = (int(x[robot]), int(y[robot]))
+        if arrays["station"][cell]:
+            queues.setdefault(cell, []).append(robot)
+    for queue in queues.values():
+        queue.sort(key=lambda robot: (arrays["arrived"][robot], robot))
+
+    def at_station(indices):
+        # Same rule as RandomModel: only queue heads charge
+        stays = np.zeros(len(indices), dtype=bool)
+        charges = np.zeros(len(indices), dtype=bool)
+        for k, i in enumerate(indices):
+            robot = members[i]
+            queue = queues[int(x[robot]), int(y[robot])]
+            if robots["in_crisis"][i] or len(queue) == 1:
+                stays[k] = True
+                charges[k] = robots["battery"][i] < 100 and queue[0] == robot
+        return stays, charges
+
+    def station_steps(indices):
+        # Down the distance to the nearest station, around taken cells if it can
+        distance = arrays["station_distance"][window]
+        steps = np.full((len(indices), 2), -1)
+        arrives = np.zeros(len(indices), dtype=bool)
+        for k, i in enumerate(indices):
+            px, py = robots["position"][i]
+            if distance[px, py] < 0:
+                continue
+            closer = [
+                (px + dx, py + dy) for dx, dy in OFFSETS
+                if 0 <= px + dx < hi - lo and 0 <= py + dy < distance.shape[1]
+                and 0 <= distance[px + dx, py + dy] < distance[px, py]
+            ]
+            step = min(closer, key=lambda cell: (taken[cell] and distance[cell] > 0, distance[cell]))
+            steps[k] = step
+            arrives[k] = distance[step] == 0
+        return steps, arrives
+
+    action, _ = synchronous_tick(robots, layers, graph, ids, rng, at_station, station_steps, priority,
+                                 occupied=others > 0)
+
+    np.subtract.at(arrays["robots"], (x[members], y[members]), 1)
+    moved = action == MOVE
+    x[members] = robots["position"][:, 0] + lo
+    y[members] = robots["position"][:, 1]
+    np.add.at(arrays["robots"], (x[members], y[members]), 1)
+    arrays["arrived"][members[moved]] = tick
+    for name in TICK_FIELDS:
+        arrays[name][members] = robots[name]
+    arrays["stepped"][members] = tick
+    live = members[~robots["dead"]]
+    arrays["last_visit"][x[live], y[live]] = tick
+
+
+def _worker(names, specs, bounds, strips, seed, priority, barrier, conn):
+    """Step the robots of some strips every time the parent asks for ticks.
+
+    Answers with the CPU seconds spent on each phase (two per tick).
+    """
+    memories = {name: SharedMemory(name=memory) for name, memory in names.items()}
+    arrays = _views(memories, specs)
+    graphs = {}
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            first, ticks = request
+            seconds = []
+            for tick in range(first, first + ticks):
+                # Even strips first, then odd ones
+                for color in (0, 1):
+                    start = time.process_time()
+                    for strip in strips:
+                        if strip % 2 == color:
+                            rng = np.random.default_rng([seed, tick, strip])
+                            step_strip(arrays, bounds[strip], bounds[strip + 1], tick, rng, priority, graphs)
+                    seconds.append(time.process_time() - start)
+                    # Nobody starts the next phase until every strip is done
+                    barrier.wait()
+            conn.send(seconds)
+    finally:
+        del arrays
+        for memory in memories.values():
+            memory.close()
+
+
+def _release(processes, connections, memories):
+    """Stop the workers and free the shared arrays."""
+    for conn in connections:
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join()
+    for memory in memories:
+        memory.close()
+        memory.unlink()
+
+
+def _sample(rng, mask, count):
+    """Layer with count random cells of mask, and their (x, y) coordinates."""
+    cells = np.argwhere(mask)
+    chosen = cells[rng.choice(len(cells), min(count, len(cells)), replace=False)]
+    layer = np.zeros_like(mask)
+    layer[chosen[:, 0], chosen[:, 1]] = True
+    return layer, chosen
+
+
+class ApproximateShardedRoomba:
+    """
+    Approximate robot fleet on a floor split in vertical strips stepped by a
+    pool of processes. Every strip steps its robots with synchronous_tick,
+    the rules of RandomModel(synchronous=True), but what a strip can't see is
+    approximated, so its results are not the ones RandomModel would give.
+
+    The robots and layers live in shared memory. Each tick, workers step the
+    robots of the even strips, wait at a barrier, then step the odd strips.
+    A robot only sees and touches cells up to REACH columns past its strip,
+    so strips of the same color never share cells: occupancy at the strip
+    borders is always the one left by the previous phase. A robot belongs to
+    the strip it stands on, so crossing a border migrates it to the strip's
+    worker. Every strip draws from its own random generator, seeded with
+    (seed, tick, strip), so a run only depends on the seed and the strips, not
+    on the number of workers or their timing.
+
+    Differences with RandomModel(synchronous=True), all at the strip borders:
+    - Robots in crisis go down a precomputed distance field to the nearest
+      station instead of reserving one with StationManager, since queues
+      could span strips; a station's queue is the robots standing on it, in
+      order of arrival
+    - Exploring robots look for the nearest frontier within REACH columns of
+      their strip only
+    - Robots of other strips are seen where they were at the start of the
+      phase, and stay put
+    - random() draws its own layout; use from_model to run on the layout of
+      a RandomModel and compare both (see benchmark_sharded.py)
+    """
+
+    def __init__(self, obstacle, station, trash, positions, seed=42, max_time=500, shards=None, workers=None,
+                 priority="battery"):
+        """
+        Args:
+            obstacle, station, trash: [x, y] bool layers of the floor
+            positions: (R, 2) array with the (x, y) start of every robot
+            max_time: Number of ticks of the run
+            shards: Number of strips (about 16 columns each by default); each
+                one must be at least MIN_STRIP columns wide
+            workers: Number of processes (one per CPU by default)
+            priority: Robot that gets a cell several want (see PRIORITIES)
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        obstacle = np.asarray(obstacle, dtype=bool)
+        width, height = obstacle.shape
+        positions = np.asarray(positions, dtype=np.int32).reshape(-1, 2)
+        shards = shards or max(1, width // 16)
+        if shards > 1 and width // shards < MIN_STRIP:
+            raise ValueError(f"Strips must be at least {MIN_STRIP} columns wide, use at most {width // MIN_STRIP} shards")
+
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.max_time = max_time
+        self.steps = 0
+        self.num_agents = len(positions)
+        self.bounds = np.linspace(0, width, shards + 1).astype(int)
+        self.shards = shards
+        self.workers = min(workers or os.cpu_count(), shards)
+
+        specs = _specs(width, height, self.num_agents)
+        self._memories = {
+            name: SharedMemory(create=True, size=max(1, math.prod(shape) * np.dtype(dtype).itemsize))
+            for name, (shape, dtype) in specs.items()
+        }
+        self.arrays = _views(self._memories, specs)
+        arrays = self.arrays
+        arrays["obstacle"][:] = obstacle
+        arrays["station"][:] = station
+        arrays["trash"][:] = trash
+        arrays["station_distance"][:] = station_distances(obstacle, arrays["station"])
+        arrays["robots"][:] = 0
+        arrays["last_visit"][:] = -1
+        for name in ROBOT_FIELDS:
+            arrays[name][:] = 0
+        arrays["x"][:] = positions[:, 0]
+        arrays["y"][:] = positions[:, 1]
+        arrays["battery"][:] = 100
+        np.add.at(arrays["robots"], (positions[:, 0], positions[:, 1]), 1)
+        arrays["last_visit"][positions[:, 0], positions[:, 1]] = 0
+        self.cleanable = int(np.count_nonzero(~obstacle))
+
+        # Kept alive here until the workers (possibly spawned) have attached to it
+        self._barrier = mp.Barrier(self.workers)
+        names = {name: memory.name for name, memory in self._memories.items()}
+        self._processes = []
+        self._connections = []
+        # Deal the even strips, then the odd ones, so every worker has some of each phase
+        order = sorted(range(shards), key=lambda strip: (strip % 2, strip))
+        for worker in range(self.workers):
+            parent_conn, child_conn = mp.Pipe()
+            strips = sorted(order[worker::self.workers])
+            process = mp.Process(
+                target=_worker,
+                args=(names, specs, self.bounds, strips, seed, priority, self._barrier, child_conn),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+
+        self._finalizer = weakref.finalize(
+            self, _release, self._processes, self._connections, list(self._memories.values())
+        )
+        self.running = True
+        self.history = []
+        self.phase_seconds = np.zeros((self.workers, 0))  # CPU seconds of every worker in each phase of the last run
+        self.collect()
+
+    @classmethod
+    def random(cls, num_agents=10, width=8, height=8, seed=42, percentage_dirty=20, percentage_obstacles=10, **kwargs):
+        """
+        Random floor like the one of RandomModel: walls on the border, then
+        obstacles, trash and one recharge station per robot on free cells.
+        """
+        rng = np.random.default_rng(seed)
+        obstacle = np.zeros((width, height), dtype=bool)
+        obstacle[[0, -1], :] = True
+        obstacle[:, [0, -1]] = True
+        available = (width - 2) * (height - 2)
+        obstacle |= _sample(rng, ~obstacle, int(available * percentage_obstacles / 100))[0]
+        trash = _sample(rng, ~obstacle, int(available * percentage_dirty / 100))[0]
+        station, positions = _sample(rng, ~obstacle & ~trash, num_agents)
+        return cls(obstacle, station, trash, positions, seed=seed, **kwargs)
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        """
+        Floor and robots of a RandomModel, as they are now (the same layout,
+        robots, max_time and priority), to compare both simulators.
+        """
+        robots = [a for a in model.agents if isinstance(a, RandomAgent)]
+        positions = np.array([a.cell.coordinate for a in robots]).reshape(-1, 2)
+        kwargs.setdefault("seed", model.seed)
+        kwargs.setdefault("max_time", model.max_time)
+        kwargs.setdefault("priority", model.priority)
+        return cls(model.grid.obstacle.data, model.grid.station.data, model.grid.trash.data, positions, **kwargs)
+
+    @classmethod
+    def from_floorplan(cls, floorplan, num_agents=10, seed=42, percentage_dirty=20, **kwargs):
+        """
+        Floor of a Floorplan (see load_floorplan). Like RandomModel, robots start
+        on the stations of the plan, and trash and stations it does not have
+        are placed at random on free cells.
+        """
+        rng = np.random.default_rng(seed)
+        obstacle = np.asarray(floorplan.obstacle)
+        free = ~obstacle
+        if floorplan.trash is not None:
+            trash = np.asarray(floorplan.trash) & free
+        else:
+            trash = _sample(rng, free, int(np.count_nonzero(free) * percentage_dirty / 100))[0]
+        if floorplan.station is not None:
+            station = np.asarray(floorplan.station) & free
+            positions = np.argwhere(station)
+        else:
+            station, positions = _sample(rng, free & ~trash, num_agents)
+        return cls(obstacle, station, trash, positions, seed=seed, **kwargs)
+
+    def run(self, ticks):
+        """Advance every strip by a number of ticks."""
+        for conn in self._connections:
+            conn.send((self.steps + 1, ticks))
+        self.phase_seconds = np.array([conn.recv() for conn in self._connections])
+        self.steps += ticks
+
+    def step(self):
+        """Advance one tick, record the metrics and check if the run is over."""
+        self.run(1)
+        self.collect()
+        if self.steps >= self.max_time or not self.arrays["trash"].any() or self.arrays["dead"].all():
+            self.running = False
+
+    def collect(self):
+        """Record the metrics of the RandomModel data collector."""
+        arrays = self.arrays
+        trash = int(np.count_nonzero(arrays["trash"]))
+        self.history.append({
+            "Battery": float(arrays["battery"].mean()) if self.num_agents else 0.0,
+            "Percentage Clean": float((self.cleanable - trash) / self.cleanable * 100) if self.cleanable else 100.0,
+            "Time": self.max_time - self.steps,
+            "Total Movements": int(arrays["steps_taken"].sum()),
+        })
+
+    def robots(self):
+        """Copy of the robot arrays, by field name."""
+        return {name: self.arrays[name].copy() for name in ROBOT_FIELDS if name != "stepped"}
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        del self.arrays
+        self._finalizer()
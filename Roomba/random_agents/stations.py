@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+
+from .agent import RandomAgent
+from .planning import bfs_search, trace_path
+
+
+def charge_ticks(battery):
+    """Ticks a robot needs on a station to go from battery to 100 (5% per tick)."""
+    return max(0, math.ceil((100 - battery) / 5))
+
+
+class StationManager:
+    """
+    Queues of the robots that reserved each recharge station.
+    The first robot of a queue is the one charging, the rest wait their turn.
+    Low-battery robots are sent to the station where they would start charging
+    first, counting the trip and the wait for the robots queued before them.
+    Attributes:
+        queues: Station (x, y) coordinate -> robots that reserved it, in order
+        reservations: Robot -> (x, y) coordinate of its station
+    """
+
+    def __init__(self, model):
+        """
+        Args:
+            model: RandomModel whose station layer is already built
+        """
+        self.model = model
+        self.queues = {tuple(int(i) for i in xy): [] for xy in np.argwhere(model.grid.station.data)}
+        self.reservations = {}
+        self.assignments = 0  # Number of station searches
+
+    def arrival_ticks(self, robot, station):
+        """Ticks until a robot that reserved station gets there."""
+        if robot.cell.coordinate == station:
+            return 0
+        return len(robot.path_to_station)
+
+    def available_in(self, station):
+        """Expected ticks until every robot queued at station got there and charged."""
+        ticks = 0
+        for other in self.queues[station]:
+            arrival = self.arrival_ticks(other, station)
+            ticks = max(ticks, arrival) + charge_ticks(other._battery - arrival)
+        return ticks
+
+    def assign(self, robot):
+        """
+        Reserve the station that minimizes travel plus wait for a robot, preferring
+        stations it can reach before its battery runs out. A robot that plans
+        again and keeps its station keeps its place in the queue.
+        Args:
+            robot: RandomAgent that needs to recharge
+        Returns: list of cells to the station, or [] if no station can be reached
+        """
+        reserved = self.reservations.get(robot)
+        place = self.queues[reserved].index(robot) if reserved is not None else None
+        self.release(robot)
+        self.assignments += 1
+
+        # Stations come out of the search by travel, and travel + wait >= travel
+        best = {}
+
+        def consider(station, travel):
+            cost = max(travel, self.available_in(station))
+            key = (travel >= robot._battery, cost)
+            if "key" not in best or key < best["key"]:
+                best.update(key=key, station=station)
+            return travel >= best["key"][1] and not best["key"][0]
+
+        grid = self.model.grid
+        planner = self.model.planner
+        if planner is not None:
+            # Other robots are left to the agent, which steps around them
+            previous = planner.search(robot.cell.coordinate, self.queues, consider)
+        else:
+            # Robots in crisis move through empty cells or recharge stations,
+            # but stations with robots on them can only be the destination
+            occupied = np.zeros(grid.station.data.shape, dtype=bool)
+            for agent in self.model.agents:
+                if isinstance(agent, RandomAgent):
+                    occupied[agent.cell.coordinate] = True
+            stations = grid.station.data
+            passable = ~occupied & (stations | (~grid.obstacle.data & ~grid.trash.data))
+            previous = bfs_search(passable, robot.cell.coordinate, stations, consider)
+        if "station" not in best:
+            return []
+
+        station = best["station"]
+        if station == reserved:
+            self.queues[station].insert(place, robot)
+        else:
+            self.queues[station].append(robot)
+        self.reservations[robot] = station
+        if planner is not None:
+            return planner.path(previous, station, grid)
+        return [grid[x, y] for x, y in trace_path(previous, station)]
+
+    def charging(self, robot):
+        """
+        Check if a robot on a station is the one charging there, queuing it if it
+        had no reservation. A robot that gets there before the ones queued ahead
+        of it (still on their way) goes first.
+        Returns: True if the robot can charge this tick
+        """
+        station = robot.cell.coordinate
+        if self.reservations.get(robot) != station:
+            self.release(robot)
+            self.queues[station].append(robot)
+            self.reservations[robot] = station
+
+        queue = self.queues[station]
+        if queue[0] is robot:
+            return True
+        if queue[0].cell.coordinate != station:
+            queue.remove(robot)
+            queue.insert(0, robot)
+            return True
+        return False
+
+    def reserved_by_others(self, robot):
+        """Check if other robots are queued at the station a robot is on."""
+        return any(other is not robot for other in self.queues[robot.cell.coordinate])
+
+    def release(self, robot):
+        """Cancel the reservation of a robot (when it is full or dead)."""
+        station = self.reservations.pop(robot, None)
+        if station is not None:
+            self.queues[station].remove(robot)
@@ -0,0 +1,181 @@
+import numpy as np
+
+from .planning import dilate, distance_field, nearest_trash_paths, windows
+
+# Robots that want the same cell: the one with the lowest battery, or the
+# lowest id, gets it (ties on battery go to the lowest id)
+PRIORITIES = ("battery", "id")
+
+TRASH_RADIUS = 5  # Farthest trash robots look for, like find_nearest_trash
+SENSE_RADIUS = 2  # Cells around each visited cell that count as explored, like frontier_path
+
+# Actions of a robot in a tick
+IDLE, CLEAN, RECHARGE, MOVE, DIE = range(5)
+
+
+def resolve_conflicts(positions, targets, rank, shape):
+    """
+    Robots that get the cell they want when all of them move at once.
+    Targets are free at the start of the tick, so the only conflicts are
+    robots that want the same cell: the first one by rank gets it.
+    Args:
+        positions, targets: (R, 2) arrays with the cell of every robot and the
+            one it wants (its own cell to stay)
+        rank: (R,) array, lower goes first
+        shape: Size of the grid
+    Returns: (R,) bool array of the robots that move
+    """
+    moves = (targets != positions).any(axis=1)
+    movers = np.flatnonzero(moves)
+    if not len(movers):
+        return moves
+    cells = np.ravel_multi_index((targets[movers, 0], targets[movers, 1]), shape)
+    order = np.lexsort((rank[movers], cells))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cells[order[1:]] != cells[order[:-1]]
+    moves[:] = False
+    moves[movers[order[first]]] = True
+    return moves
+
+
+def _downhill(field, free, positions, noise=None):
+    """
+    Free neighbor of every robot with the lowest value of field, if lower than
+    the value of its own cell (ties broken by noise).
+    Returns: (R, 2) targets, the robot's own cell when it has nowhere to go
+    """
+    values = windows(field.astype(float), positions, 1, fill=np.inf)
+    own = values[:, 1, 1].copy()
+    values[~windows(free, positions, 1)] = np.inf
+    values[values < 0] = np.inf
+    if noise is not None:
+        values += noise
+    flat = values.reshape(len(positions), 9)
+    best = flat.argmin(axis=1)
+    go = flat[np.arange(len(positions)), best] < own
+    offsets = np.stack(np.unravel_index(best, (3, 3)), axis=1) - 1
+    return np.where(go[:, None], positions + offsets, positions)
+
+
+def synchronous_tick(robots, layers, graph, ids, rng, at_station, station_steps, priority="battery", occupied=None):
+    """
+    One tick of every robot from the same snapshot of the floor, with the
+    rules of RandomAgent.step. Stations are left to callbacks (the model uses
+    its StationManager), which only see the robots on or heading to one.
+    Explorers go down the distance to the nearest frontier (like frontier_path,
+    without claims), or patrol to the neighbor visited longest ago once the
+    floor is covered.
+    Args:
+        robots: Arrays indexed by robot (position (R, 2), battery, in_crisis,
+            dead, cleaned_trash, recharges, steps_taken), updated in place
+        layers: [x, y] arrays obstacle, station, trash and last_visit; trash
+            is updated in place
+        graph, ids: moore_graph of the cells without obstacles or dead robots
+        rng: numpy Generator for the ties between cells to explore
+        at_station: Called with the indices of the robots on a station that
+            could recharge; returns two bool arrays, the ones that stay and the
+            ones that charge this tick
+        station_steps: Called with the indices of the robots in crisis; returns
+            the (x, y) of their next step to a station, (-1, -1) if they can't
+            reach any, and a bool array of the steps onto the station itself,
+            taken even when robots are on it (they queue there)
+        priority: "battery" or "id" (see PRIORITIES)
+        occupied: [x, y] bool layer of the cells taken by robots that are not
+            in robots and stay put this tick, or None
+    Returns: (R,) array with the action of every robot (IDLE, CLEAN, RECHARGE,
+        MOVE or DIE), and (R,) bool array of the robots heading to a station
+    """
+    position = robots["position"]
+    battery = robots["battery"]
+    x, y = position[:, 0], position[:, 1]
+    obstacle, station, trash = layers["obstacle"], layers["station"], layers["trash"]
+    live = ~robots["dead"]
+
+    # Dead robots stay on their cell
+    occupied = np.zeros(obstacle.shape, dtype=bool) if occupied is None else occupied.copy()
+    occupied[x, y] = True
+    free = ~obstacle & ~occupied
+
+    action = np.full(len(battery), IDLE)
+    dies = live & (battery <= 0)
+    cleans = live & ~dies & trash[x, y]
+    stays = live & ~dies & ~cleans & station[x, y] & (robots["in_crisis"] | (battery < 100))
+    recharges = np.zeros_like(stays)
+    if stays.any():
+        indices = np.flatnonzero(stays)
+        stays[indices], recharges[indices] = at_station(indices)
+    acting = live & ~dies & ~cleans & ~stays
+    crisis = acting & ~station[x, y] & (battery <= 35)
+    exploring = acting & ~crisis
+    targets = position.copy()
+
+    if crisis.any():
+        indices = np.flatnonzero(crisis)
+        steps, arrives = station_steps(indices)
+        steps = np.asarray(steps).reshape(-1, 2)
+        stranded = steps[:, 0] < 0
+        dies[indices[stranded]] = True
+        crisis[indices[stranded]] = False
+        indices, steps = indices[~stranded], steps[~stranded]
+        arrives = np.asarray(arrives, dtype=bool)[~stranded]
+        robots["in_crisis"][indices] = True
+        # Wait while the next cell is taken, unless it is the station to queue on
+        go = free[steps[:, 0], steps[:, 1]] | arrives
+        targets[indices[go]] = steps[go]
+
+    if exploring.any():
+        # Robots step on trash, other robots only block the first step
+        passable = ~obstacle & (~occupied | trash | station)
+        paths = nearest_trash_paths(passable, trash, position[exploring], TRASH_RADIUS)
+        indices = np.flatnonzero(exploring)
+        wandering = []
+        for robot, path in zip(indices, paths):
+            if path:
+                if free[path[0]]:
+                    targets[robot] = path[0]
+            else:
+                wandering.append(robot)
+
+        if wandering:
+            wandering = np.array(wandering)
+            noise = rng.random((len(wandering), 3, 3)) / 2
+            explored = layers["last_visit"] >= 0
+            for _ in range(SENSE_RADIUS):
+                explored = dilate(explored)
+            frontier = ~obstacle & ~explored & dilate(explored)
+            distance = distance_field(graph, ids, frontier)
+            targets[wandering] = _downhill(distance, free, position[wandering], noise)
+
+            # Once nothing is left to explore, patrol to the neighbor visited longest ago
+            patrol = wandering[distance[x[wandering], y[wandering]] < 0]
+            if len(patrol):
+                last_visit = layers["last_visit"] + 1.0  # Never visited (-1) comes first
+                last_visit[position[patrol, 0], position[patrol, 1]] = np.inf
+                patrol_noise = noise[np.isin(wandering, patrol)]
+                targets[patrol] = _downhill(last_visit, free, position[patrol], patrol_noise)
+
+    if priority == "battery":
+        rank = np.lexsort((np.arange(len(battery)), battery))
+    else:
+        rank = np.arange(len(battery))
+    rank = np.argsort(rank)
+    moves = resolve_conflicts(position, targets, rank, obstacle.shape)
+
+    # Apply everything at once
+    trash[x[cleans], y[cleans]] = False
+    robots["cleaned_trash"][cleans] += 1
+    battery[recharges] = np.minimum(100, battery[recharges] + 5)
+    robots["recharges"][recharges] += 1
+    robots["in_crisis"][stays & (battery >= 100)] = False
+    spends = cleans | crisis | exploring
+    battery[spends] -= 1
+    robots["steps_taken"][spends] += 1
+    position[moves] = targets[moves]
+    battery[dies] = 0
+    robots["dead"][dies] = True
+
+    action[cleans] = CLEAN
+    action[recharges] = RECHARGE
+    action[moves] = MOVE
+    action[dies] = DIE
+    return action, crisis
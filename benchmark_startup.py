@@ -0,0 +1,93 @@
+"""Startup time of fresh processes, like the ones worker pools spawn, for the
+Automata_Celular and Roomba projects.
+
+For each project: imports its model packages (which must not pull in the
+modules it lists as forbidden, like mesa.visualization), builds a default
+model, and imports its pages (which must not build a model until they are
+rendered).
+
+Usage: python benchmark_startup.py [project] [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECTS = {
+    "Automata_Celular": {
+        "packages": ["game_of_life.model", "game_of_life.ensemble", "game_of_life.tiled"],
+        "build": "game_of_life.model.ConwaysGameOfLife()",
+        "forbidden": ["mesa.visualization", "solara"],
+        "pages": ["ruido_server", "fractales_server"],
+        "model": "ConwaysGameOfLife",
+    },
+    "Roomba": {
+        "packages": ["random_agents.model", "random_agents.sharded", "random_agents.floorplan"],
+        "build": "random_agents.model.RandomModel()",
+        # Only the graph planners need it, and mesa doesn't import it
+        "forbidden": ["mesa.visualization", "solara", "scipy.sparse.csgraph"],
+        "pages": ["app"],
+        "model": "RandomModel",
+    },
+}
+
+HEADLESS = """
+import sys, time
+start = time.perf_counter()
+import {packages}
+imported = time.perf_counter()
+{build}
+built = time.perf_counter()
+loaded = [name for name in sys.modules if name.startswith(tuple({forbidden!r}))]
+assert not loaded, f"the model packages import {{loaded}}"
+print(imported - start, built - imported)
+"""
+
+PAGE = """
+import gc, time
+start = time.perf_counter()
+import {page} as page
+imported = time.perf_counter()
+models = [o for o in gc.get_objects() if isinstance(o, page.{model})]
+assert not models, "importing {page} built a model"
+print(imported - start)
+"""
+
+
+def run(code, project):
+    """Seconds printed by code, run in a new interpreter in the project's directory."""
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), project)
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True,
+                            cwd=directory)
+    if result.returncode:
+        raise SystemExit(result.stderr)
+    return [float(value) for value in result.stdout.split()]
+
+
+def benchmark(project, runs):
+    settings = PROJECTS[project]
+    headless = HEADLESS.format(packages=", ".join(settings["packages"]), build=settings["build"],
+                               forbidden=settings["forbidden"])
+    times = [run(headless, project) for _ in range(runs)]
+
+    print(f"{project + ', median of ' + str(runs) + ' runs':<36} {'seconds':>8}")
+    print(f"{'import model packages':<36} {statistics.median(t for t, _ in times):8.3f}")
+    print(f"{'build default ' + settings['model']:<36} {statistics.median(t for _, t in times):8.3f}")
+    for page in settings["pages"]:
+        code = PAGE.format(page=page, model=settings["model"])
+        times = [run(code, project)[0] for _ in range(runs)]
+        print(f"{'import ' + page + ' (no model)':<36} {statistics.median(times):8.3f}")
+
+
+def main():
+    projects = [sys.argv[1]] if len(sys.argv) > 1 else list(PROJECTS)
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    for project in projects:
+        if project not in PROJECTS:
+            raise SystemExit(f"Unknown project {project!r}, expected one of {tuple(PROJECTS)}")
+        benchmark(project, runs)
+        print()
+
+
+if __name__ == "__main__":
+    main()